@@ -1,3 +1,5 @@
+from django.db.models import Exists, OuterRef
+
 from django_filters.rest_framework import filters, FilterSet
 
 from recipes.models import Ingredient, Recipe, Tag
@@ -13,9 +15,10 @@ class RecipeFilter(FilterSet):
     )
     tags = filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
-        field_name='tags__slug',
         to_field_name='slug',
+        method='filter_tags',
     )
+    search = filters.CharFilter(method='filter_search')
     is_favorited = filters.BooleanFilter(method='check_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='check_is_in_shopping_cart'
@@ -24,10 +27,33 @@ class RecipeFilter(FilterSet):
     class Meta:
         model = Recipe
         fields = (
-            'author', 'tags',
+            'author', 'tags', 'search',
             'is_favorited', 'is_in_shopping_cart',
         )
 
+    def filter_tags(self, queryset, name, value):
+        """
+        Оставляет рецепты, у которых есть хотя бы один из тегов.
+        Фильтрация выполняется подзапросом EXISTS, а не JOIN,
+        поэтому рецепты не дублируются и не нужен DISTINCT.
+        """
+        if not value:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'),
+                tag_id__in=[tag.pk for tag in value],
+            )
+        ))
+
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию рецепта.
+        Результаты сортируются по релевантности; при курсорной
+        пагинации порядок по дате публикации сохраняется.
+        """
+        return queryset.search(value)
+
     def check_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
             return queryset.filter(favorites__user=self.request.user)
@@ -0,0 +1,14 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FileFormatContentNegotiation(DefaultContentNegotiation):
+    """
+    Кастомный класс для выбора рендерера.
+    Параметр запроса format может задавать формат выгружаемого файла,
+    поэтому форматы, для которых нет рендерера, не приводят к ошибке 404.
+    """
+
+    def filter_renderers(self, renderers, format):
+        return [
+            renderer for renderer in renderers if renderer.format == format
+        ] or renderers
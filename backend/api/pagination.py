@@ -1,4 +1,13 @@
+import base64
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
@@ -6,3 +15,102 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_query_param = 'page'
     max_page_size = 100
+
+
+class RecipePagination(CustomPagination):
+    """
+    Пагинация ленты рецептов.
+    По умолчанию постраничная, как CustomPagination.
+    С параметром 'pagination=cursor' (или 'cursor') включается пагинация
+    по курсору (pub_date, id): страница выбирается по индексу без OFFSET,
+    а ссылки next и previous не сдвигаются при добавлении рецептов.
+    Параметр 'count=false' отключает подсчет общего количества рецептов.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) != 'false':
+            self.count = queryset.count()
+        cursor = self.decode_cursor(request)
+        reverse = False
+        if cursor is None:
+            queryset = queryset.order_by('-pub_date', '-id')
+        else:
+            pub_date, pk, reverse = cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+                ).order_by('pub_date', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+                ).order_by('-pub_date', '-id')
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.results = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_cursor_link(self.has_next, -1, False)
+        response['previous'] = self.get_cursor_link(
+            self.has_previous, 0, True
+        )
+        response['results'] = data
+        return Response(response)
+
+    def get_cursor_link(self, exists, index, reverse):
+        if not exists or not self.results:
+            return None
+        recipe = self.results[index]
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(recipe.pub_date, recipe.pk, reverse)
+        )
+
+    def encode_cursor(self, pub_date, pk, reverse):
+        """Кодирует позицию (pub_date, id) и направление в курсор."""
+        position = f'{pub_date.isoformat()}|{pk}|{int(reverse)}'
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, request):
+        """Возвращает (pub_date, id, reverse) из курсора запроса или None."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            pub_date, pk, reverse = base64.urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk, reverse == '1'
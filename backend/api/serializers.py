@@ -1,36 +1,79 @@
+from django.db import transaction
+
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.models import (Tag, Ingredient, Recipe, RecipeIngredient,
-                            Favorites, ShoppingList)
-from core.serializers import Base64ImageField, ShortRecipeSerializer
+from recipes.models import Tag, Ingredient, Recipe, RecipeIngredient
+from core.cart import refresh_recipe_carts
+from core.catalog import ingredient_catalog, tag_catalog
+from core.images import schedule_recipe_image
+from core.relations import get_relation_ids
+from core.serializers import (Base64ImageField,
+                              CatalogPrimaryKeyRelatedField, ThumbnailField)
 from users.serializers import UserSerializer
 
 
-def create_update_recipe(ingredients, recipe):
+def create_update_recipe(ingredients, recipe, created=False):
     """
     Функция вызываемая из методов create и update
     сериалиазотора RecipeSerializer. Создает и обновляет объекты
-    в БД. Параметры функции:
+    в БД. Изменяются только те строки RecipeIngredient,
+    которые отличаются от уже сохраненных; суммы в списках покупок
+    пересчитываются одним вызовом только для измененных ингредиентов.
+    Параметры функции:
     1) ingredients - список валидированных словарей,
        которые содержат id игредиента и его количество(amount).
     2) recipe - объект модели Recipe.
+    3) created - True, если рецепт только что создан
+       и сохраненных ингредиентов у него нет.
     """
-    currents_ingredients = Ingredient.objects.filter(
-        id__in=[ingredient.get('id') for ingredient in ingredients]
-    )
-    list_ingredients = []
-    for ingredient, current_ingredient in \
-            zip(ingredients, currents_ingredients):
-        amount = ingredient.get('amount')
-        list_ingredients.append(
-            RecipeIngredient(
-                recipe=recipe,
-                ingredient=current_ingredient,
-                amount=amount
+    amounts = {
+        ingredient.get('id'): ingredient.get('amount')
+        for ingredient in ingredients
+    }
+    current_ingredients = {}
+    if not created:
+        current_ingredients = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipeingredients.all()
+        }
+    deleted_ingredients = [
+        recipe_ingredient
+        for ingredient_id, recipe_ingredient in current_ingredients.items()
+        if ingredient_id not in amounts
+    ]
+    updated_ingredients = []
+    new_ingredients = []
+    for ingredient_id, amount in amounts.items():
+        recipe_ingredient = current_ingredients.get(ingredient_id)
+        if recipe_ingredient is None:
+            new_ingredients.append(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                )
             )
-        )
-    return RecipeIngredient.objects.bulk_create(list_ingredients)
+        elif recipe_ingredient.amount != amount:
+            recipe_ingredient.amount = amount
+            updated_ingredients.append(recipe_ingredient)
+    if deleted_ingredients:
+        # Удаление без сигналов post_delete: иначе списки покупок
+        # пересчитывались бы отдельно для каждой удаленной строки.
+        RecipeIngredient.objects.filter(id__in=[
+            recipe_ingredient.id for recipe_ingredient in deleted_ingredients
+        ])._raw_delete(RecipeIngredient.objects.db)
+    if updated_ingredients:
+        RecipeIngredient.objects.bulk_update(updated_ingredients, ['amount'])
+    if new_ingredients:
+        RecipeIngredient.objects.bulk_create(new_ingredients)
+    changed_ingredients = (
+        deleted_ingredients + updated_ingredients + new_ingredients
+    )
+    if not created and changed_ingredients:
+        refresh_recipe_carts(recipe.id, [
+            recipe_ingredient.ingredient_id
+            for recipe_ingredient in changed_ingredients
+        ])
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -86,6 +129,7 @@ class GetRicepeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    thumbnail = ThumbnailField()
 
     class Meta:
         model = Recipe
@@ -99,39 +143,56 @@ class GetRicepeSerializer(serializers.ModelSerializer):
             'name',
             'text',
             'image',
+            'thumbnail',
             'cooking_time',
         )
 
     def get_author(self, obj):
         """Метод для получения автора рецепта."""
-        return UserSerializer(obj.author, many=False).data
+        return UserSerializer(
+            obj.author, many=False, context=self.context
+        ).data
 
     def get_is_favorited(self, obj):
         """
         Метод для вычисления поля сериализатора is_favorited.
         Возращает True, если рецепт есть в избранном.
         """
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Favorites.objects.filter(
-                user=request.user, recipe=obj).exists()
-        return False
+        return obj.id in get_relation_ids(
+            self.context.get('request'), 'favorites'
+        )
 
     def get_is_in_shopping_cart(self, obj):
         """
         Метод для вычисления поля сериализатора is_in_shopping_cart.
         Возращает True, если рецепт есть в списке покупок.
         """
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return ShoppingList.objects.filter(
-                user=request.user, recipe=obj).exists()
-        return False
+        return obj.id in get_relation_ids(
+            self.context.get('request'), 'shopping_cart'
+        )
+
+
+class CookableRecipeSerializer(GetRicepeSerializer):
+    """
+    Сериализатор рецептов для поиска по имеющимся ингредиентам.
+    Дополнительно отдает количество найденных ингредиентов
+    и их долю от всех ингредиентов рецепта.
+    """
+
+    matched_ingredients = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(GetRicepeSerializer.Meta):
+        fields = GetRicepeSerializer.Meta.fields + (
+            'matched_ingredients',
+            'coverage',
+        )
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор модели Recipe."""
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = CatalogPrimaryKeyRelatedField(
+        catalog=tag_catalog,
         queryset=Tag.objects.all(),
         many=True
     )
@@ -171,35 +232,49 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Рецепт не может быть без ингредиентов.'
             )
-        ingredient_list = []
-        for ingredient in data:
-            check = Ingredient.objects.filter(id=ingredient['id']).exists()
-            if not check:
-                raise serializers.ValidationError(
-                    'Такого ингредиента не существует!'
-                )
-            if ingredient['amount'] == 0:
-                raise serializers.ValidationError(
-                    'Количество ингредиента должно быть больше 0!'
-                )
-            if ingredient['id'] in ingredient_list:
-                raise serializers.ValidationError(
-                    'Ингредиенты не могут повторяться!'
+        ingredient_ids = [ingredient['id'] for ingredient in data]
+        missing_ids = set(ingredient_ids) - ingredient_catalog.existing_pks(
+            ingredient_ids
+        )
+        if missing_ids:
+            raise serializers.ValidationError(
+                'Таких ингредиентов не существует: {}!'.format(
+                    ', '.join(str(pk) for pk in sorted(missing_ids))
                 )
-            ingredient_list.append(ingredient['id'])
+            )
+        if any(ingredient['amount'] < 1 for ingredient in data):
+            raise serializers.ValidationError(
+                'Количество ингредиента должно быть больше 0!'
+            )
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Ингредиенты не могут повторяться!'
+            )
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
+        """
+        Создает рецепт и возвращает его вместе с автором, тегами
+        и ингредиентами, чтобы ответ строился фиксированным
+        числом запросов при любом количестве ингредиентов.
+        """
         request = self.context.get('request')
         author = request.user
         ingredients = validated_data.pop('recipeingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags)
-        create_update_recipe(ingredients, recipe)
-        return recipe
+        create_update_recipe(ingredients, recipe, created=True)
+        schedule_recipe_image(recipe)
+        return Recipe.objects.with_related().get(pk=recipe.pk)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        """
+        Обновляет рецепт и, как create, возвращает его
+        вместе с автором, тегами и ингредиентами.
+        """
         if 'ingredients' not in self.initial_data \
                 or 'tags' not in self.initial_data:
             raise serializers.ValidationError(
@@ -207,13 +282,12 @@ class RecipeSerializer(serializers.ModelSerializer):
             )
         ingredients = validated_data.pop('recipeingredients')
         tags = validated_data.pop('tags')
-        instance.tags.clear()
         instance.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
         super().update(instance, validated_data)
         create_update_recipe(ingredients, recipe=instance)
-        instance.save()
-        return instance
+        if 'image' in validated_data:
+            schedule_recipe_image(instance)
+        return Recipe.objects.with_related().get(pk=instance.pk)
 
     def to_representation(self, instance):
         request = self.context.get('request')
@@ -223,41 +297,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    """Сериализатор избранных рецептов."""
-
-    class Meta:
-        model = Favorites
-        fields = '__all__'
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Favorites.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже добавлен в избранное!'
-            )
-        ]
-
-    def to_representation(self, instance):
-        recipe = self.validated_data.get('recipe')
-        serializer = ShortRecipeSerializer(recipe)
-        return serializer.data
-
-
-class ShoppingListSerializer(serializers.ModelSerializer):
-    """Сериализатор списка покупок."""
-
-    class Meta:
-        model = ShoppingList
-        fields = '__all__'
-        validators = [
-            UniqueTogetherValidator(
-                queryset=ShoppingList.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже в списке покупок!'
-            )
-        ]
-
-    def to_representation(self, instance):
-        recipe = self.validated_data.get('recipe')
-        serializer = ShortRecipeSerializer(recipe)
-        return serializer.data
+class ShoppingCartLineSerializer(serializers.Serializer):
+    """Сериализатор строки списка покупок."""
+    name = serializers.CharField()
+    measurement_unit = serializers.CharField()
+    amount = serializers.IntegerField(source='ingredient_sum')
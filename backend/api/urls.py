@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 
+from api import async_views
 from api.views import (TagViewSet, RecipeViewSet,
                        IngredientViewSet)
 from core.urls import router_api_v1
@@ -13,3 +15,13 @@ router_api_v1.register(r'recipes', RecipeViewSet, basename='recipes')
 urlpatterns = [
     path('', include(router_api_v1.urls)),
 ]
+
+# Под ASGI список и страница рецепта обслуживаются асинхронными
+# представлениями, остальные маршруты - вьюсетами. Теги и ингредиенты
+# отдаются из справочника в памяти процесса и не ждут БД,
+# поэтому остаются во вьюсетах.
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path('recipes/', async_views.recipe_list),
+        path('recipes/<int:pk>/', async_views.recipe_detail),
+    ] + urlpatterns
@@ -1,7 +1,8 @@
-import hashlib
-
-from django.db.models import Sum
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 
 from django_filters.rest_framework import DjangoFilterBackend
 
@@ -10,40 +11,63 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 
-from recipes.models import (Tag, Ingredient, Recipe, RecipeIngredient,
+from recipes.models import (Tag, Ingredient, Recipe,
                             Favorites, ShoppingList, ShortLinkRecipe)
 from api.serializers import (TagSerializer, RecipeSerializer,
-                             IngredientSerializer, FavoriteSerializer,
-                             ShoppingListSerializer)
-from api.pagination import CustomPagination
+                             IngredientSerializer, CookableRecipeSerializer,
+                             ShoppingCartLineSerializer)
+from api.pagination import CustomPagination, RecipePagination
 from api.permissions import (IsAuthorOrReadOnlyPermissions,
                              IsAdminOrReadOnlyPermissions)
 from api.filters import RecipeFilter, IngredientFilter
-from core.views import create_shop_cart
+from api.negotiation import FileFormatContentNegotiation
+from core.autocomplete import ingredient_autocomplete
+from core.cart import get_cart_lines
+from core.catalog import filter_by_name, ingredient_catalog, tag_catalog
+from core.constants import (AUTOCOMPLETE_DEFAULT_LIMIT, AUTOCOMPLETE_MAX_LIMIT,
+                            MIN_COVERAGE_DEFAULT)
+from core.relations import add_recipe_relation, remove_recipe_relation
+from core.response_cache import recipe_response_cache
+from core.serializers import ShortRecipeSerializer
+from core.shortlinks import encode_short_link
+from core.views import (bulk_change_relations, create_shop_cart,
+                        stream_shop_cart, STREAM_FORMATS)
 
 ERROR_DICT = {
     'Favorites_post': {'Error': 'Рецепт уже в избранном!'},
     'Shopping_list_post': {'Error': 'Рецепт уже в списке покупок!'},
     'Favorites_delete': {'Error': 'Рецепта нет в избранном!'},
     'Shopping_list_delete': {'Error': 'Рецепта нет в списке покупок!'},
+    'Shopping_cart_format': {
+        'Error': 'Доступные форматы: pdf, txt, csv, json.'
+    },
+    'Cookable_ingredients': {
+        'Error': 'Передайте id ингредиентов в параметре ingredients!'
+    },
+    'Cookable_min_coverage': {
+        'Error': 'Параметр min_coverage должен быть числом от 0 до 1!'
+    },
 }
 
 
-def create_delete_shop_favorites_or_shopping_cart(
-        request, pk, model, class_serializer):
+@transaction.atomic
+def create_delete_shop_favorites_or_shopping_cart(request, pk, model):
     """
     Вспомогательная функция для создания и удаления рецептов.
     Вызывается в методах RecipeViewSet.
+    Рецепт выбирается одним запросом только с полями короткого
+    представления, добавление и удаление выполняются одним запросом
+    без предварительных проверок (см. core.relations).
     Параметры функции:
     1) request - объект запроса, хранящий данные запроса;
     2) pk - id рецепта из url запроса;
-    3) model - модель, в данной функции FavoFavorites или ShoppingList;
-    4) class_serializer - кастомные сериализаторы.
+    3) model - модель, в данной функции Favorites или ShoppingList.
     """
-    user = request.user
-    recipe = get_object_or_404(Recipe, pk=pk)
+    recipe = get_object_or_404(
+        Recipe.objects.only(*ShortRecipeSerializer.Meta.fields), pk=pk
+    )
     if request.method == 'POST':
-        if model.objects.filter(user=user, recipe=recipe).exists():
+        if not add_recipe_relation(model, request.user.id, recipe.id):
             if model.__name__ == 'Favorites':
                 return Response(
                     ERROR_DICT['Favorites_post'],
@@ -53,16 +77,11 @@ def create_delete_shop_favorites_or_shopping_cart(
                 ERROR_DICT['Shopping_list_post'],
                 status=status.HTTP_400_BAD_REQUEST
             )
-        serializer = class_serializer(
-            data={'user': user.id, 'recipe': recipe.id}
+        serializer = ShortRecipeSerializer(
+            recipe, context={'request': request}
         )
-        serializer.is_valid()
-        user = serializer.validated_data.get('user')
-        recipe = serializer.validated_data.get('recipe')
-        model.objects.create(user=user, recipe=recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    favorite_or_shop_list = model.objects.filter(user=user, recipe=recipe)
-    if not favorite_or_shop_list.exists():
+    if not remove_recipe_relation(model, request.user.id, recipe.id):
         if model.__name__ == 'Favorites':
             return Response(
                 ERROR_DICT['Favorites_delete'],
@@ -72,7 +91,6 @@ def create_delete_shop_favorites_or_shopping_cart(
             ERROR_DICT['Shopping_list_delete'],
             status=status.HTTP_400_BAD_REQUEST
         )
-    favorite_or_shop_list.delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -84,6 +102,20 @@ class TagViewSet(viewsets.ModelViewSet):
     pagination_class = None
     http_method_names = ['get', ]
 
+    @method_decorator(condition(
+        etag_func=tag_catalog.etag,
+        last_modified_func=tag_catalog.last_modified,
+    ))
+    def list(self, request, *args, **kwargs):
+        """Список тегов отдается из кэша справочника."""
+        return Response(tag_catalog.list())
+
+    def retrieve(self, request, *args, **kwargs):
+        tag = tag_catalog.get_row(kwargs[self.lookup_field])
+        if tag is None:
+            raise Http404
+        return Response(tag)
+
 
 class IngredientViewSet(viewsets.ModelViewSet):
     """Вьюсет модели Ingredient."""
@@ -95,6 +127,46 @@ class IngredientViewSet(viewsets.ModelViewSet):
     pagination_class = None
     http_method_names = ['get', ]
 
+    @method_decorator(condition(
+        etag_func=ingredient_catalog.etag,
+        last_modified_func=ingredient_catalog.last_modified,
+    ))
+    def list(self, request, *args, **kwargs):
+        """
+        Список ингредиентов отдается из кэша справочника.
+        Параметр запроса 'name' фильтрует ингредиенты
+        по началу названия без учета регистра.
+        """
+        return Response(filter_by_name(
+            ingredient_catalog.list(), request.query_params.get('name')
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        ingredient = ingredient_catalog.get_row(kwargs[self.lookup_field])
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
+
+    @action(
+        ['get', ], detail=False, url_path='autocomplete',
+        filter_backends=(),
+    )
+    def autocomplete(self, request):
+        """
+        Метод для автодополнения названия ингредиента.
+        Параметры запроса: 'name' - начало или часть названия,
+        'limit' - максимальное количество результатов.
+        Поиск выполняется по индексу в памяти без обращения к БД.
+        """
+        limit = request.query_params.get('limit', '')
+        if limit.isdigit() and int(limit) > 0:
+            limit = min(int(limit), AUTOCOMPLETE_MAX_LIMIT)
+        else:
+            limit = AUTOCOMPLETE_DEFAULT_LIMIT
+        return Response(ingredient_autocomplete.search(
+            request.query_params.get('name', ''), limit
+        ))
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет модели Recipe."""
@@ -104,27 +176,98 @@ class RecipeViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete', ]
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
+
+    def get_queryset(self):
+        """
+        Для list и retrieve рецепты выбираются вместе с автором, тегами
+        и ингредиентами, чтобы количество запросов не зависело
+        от размера страницы.
+        """
+        queryset = Recipe.objects.all()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.with_related()
+        return queryset
+
+    @recipe_response_cache
+    def list(self, request, *args, **kwargs):
+        """Ответы анонимным пользователям кэшируются."""
+        return super().list(request, *args, **kwargs)
+
+    @recipe_response_cache
+    def retrieve(self, request, *args, **kwargs):
+        """Ответы анонимным пользователям кэшируются."""
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(
+        ['get', ], detail=False, url_path='by_ingredients',
+        filter_backends=(), pagination_class=CustomPagination,
+    )
+    def get_cookable_recipes(self, request):
+        """
+        Метод для поиска рецептов по имеющимся ингредиентам.
+        Параметры запроса: 'ingredients' - id ингредиентов через запятую
+        или несколькими параметрами, 'min_coverage' - минимальная доля
+        ингредиентов рецепта, которые есть у пользователя.
+        Рецепты сортируются по этой доле.
+        """
+        ingredient_ids = set()
+        for value in request.query_params.getlist('ingredients'):
+            for ingredient_id in value.split(','):
+                if not ingredient_id.strip().isdigit():
+                    return Response(
+                        ERROR_DICT['Cookable_ingredients'],
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                ingredient_ids.add(int(ingredient_id))
+        if not ingredient_ids:
+            return Response(
+                ERROR_DICT['Cookable_ingredients'],
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            min_coverage = float(
+                request.query_params.get('min_coverage', MIN_COVERAGE_DEFAULT)
+            )
+        except ValueError:
+            min_coverage = None
+        if min_coverage is None or not 0 <= min_coverage <= 1:
+            return Response(
+                ERROR_DICT['Cookable_min_coverage'],
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = Recipe.objects.with_coverage(
+            ingredient_ids, min_coverage
+        ).with_related()
+        page = self.paginate_queryset(queryset)
+        serializer = CookableRecipeSerializer(
+            page, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
 
     @action(
         ['get', ], detail=True, url_path='get-link',
         permission_classes=[AllowAny, ]
     )
     def get_short_link(self, request, pk=None):
-        """Метод для формирования и получения короткой ссылки."""
-        original_link = self.request.build_absolute_uri()
-        list_link = original_link.split('/')
-        list_link.pop(-2)
-        recipe_link = "/".join(list_link)
+        """
+        Метод для формирования и получения короткой ссылки.
+        Код ссылки вычисляется из id рецепта (см. core.shortlinks).
+        """
         recipe = get_object_or_404(Recipe, pk=pk)
-        hash_value = hashlib.md5(recipe_link.encode()).hexdigest()[:3]
+        short_link = encode_short_link(recipe.pk)
         ShortLinkRecipe.objects.get_or_create(
             recipe=recipe,
-            defaults={'short_link': hash_value, 'original_link': recipe_link}
+            defaults={
+                'short_link': short_link,
+                'original_link': self.request.build_absolute_uri(
+                    f'/recipes/{recipe.pk}/'
+                ),
+            }
         )
         return Response({
             'short-link': self.request.build_absolute_uri(
-                f'/s/{hash_value}'
+                f'/s/{short_link}'
             )},
             status=status.HTTP_200_OK
         )
@@ -136,7 +279,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def add_or_delete_in_favorites(self, request, pk=None):
         """Метод, который добавляет либо удаляет рецепты из избранного."""
         return create_delete_shop_favorites_or_shopping_cart(
-            request, pk, Favorites, FavoriteSerializer)
+            request, pk, Favorites)
 
     @action(
         ['post', 'delete', ], detail=True,
@@ -146,30 +289,79 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def add_or_delete_recipes_shopping_cart(self, request, pk=None):
         """Метод, который добавляет либо удаляет рецепты из списка покупок."""
         return create_delete_shop_favorites_or_shopping_cart(
-            request, pk, ShoppingList, ShoppingListSerializer)
+            request, pk, ShoppingList)
+
+    @action(
+        ['post', 'delete', ], detail=False, url_path='bulk_favorite',
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_favorites(self, request):
+        """
+        Метод, который добавляет либо удаляет из избранного
+        рецепты из списка 'ids'.
+        """
+        return bulk_change_relations(request, Favorites, Recipe.objects.all())
+
+    @action(
+        ['post', 'delete', ], detail=False, url_path='bulk_shopping_cart',
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_shopping_cart(self, request):
+        """
+        Метод, который добавляет либо удаляет из списка покупок
+        рецепты из списка 'ids'.
+        """
+        return bulk_change_relations(
+            request, ShoppingList, Recipe.objects.all()
+        )
+
+    @action(
+        ['get', ], detail=False, url_path='shopping_cart_preview',
+        permission_classes=[IsAuthenticated],
+    )
+    def get_shopping_cart_preview(self, request):
+        """
+        Метод для просмотра списка покупок в формате JSON.
+        Суммы ингредиентов читаются из ShoppingCartItem.
+        """
+        serializer = ShoppingCartLineSerializer(
+            get_cart_lines(request.user), many=True
+        )
+        return Response(serializer.data)
 
     @action(
         ['get', ], detail=False,
         url_path='download_shopping_cart',
         permission_classes=[IsAuthenticated],
+        content_negotiation_class=FileFormatContentNegotiation,
     )
     def get_shopping_cart(self, request):
-        """Метод для получения и скачивания списка покупок."""
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shoppinglist__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).order_by(
-            'ingredient__name'
-        ).annotate(ingredient_sum=Sum('amount'))
-        shopping_list = []
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            measurement_unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['ingredient_sum']
-            shopping_list.append(f'{name}   {amount}  ({measurement_unit})')
-
-        response = create_shop_cart(shopping_list)
+        """
+        Метод для получения и скачивания списка покупок.
+        Формат файла задается параметром 'format': pdf (по умолчанию),
+        txt, csv или json. Текстовые форматы отдаются потоково.
+        Суммы ингредиентов читаются из ShoppingCartItem.
+        """
+        file_format = request.query_params.get('format', 'pdf')
+        if file_format != 'pdf' and file_format not in STREAM_FORMATS:
+            return Response(
+                ERROR_DICT['Shopping_cart_format'],
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ingredients = get_cart_lines(request.user)
+        if file_format in STREAM_FORMATS:
+            response = stream_shop_cart(ingredients, file_format)
+        else:
+            shopping_list = []
+            for ingredient in ingredients:
+                name = ingredient['name']
+                measurement_unit = ingredient['measurement_unit']
+                amount = ingredient['ingredient_sum']
+                shopping_list.append(
+                    f'{name}   {amount}  ({measurement_unit})'
+                )
+            response = create_shop_cart(shopping_list)
         response['Content-Disposition'] = 'attachment;' \
-                                          'filename="shopping_list.pdf"'
+                                          'filename="shopping_list.' \
+                                          f'{file_format}"'
         return response
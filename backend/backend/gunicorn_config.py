@@ -0,0 +1,85 @@
+"""
+Настройки gunicorn для production.
+
+Запуск: gunicorn --config python:backend.gunicorn_config
+
+Переменные окружения:
+GUNICORN_BIND - адрес, по умолчанию 0.0.0.0:8080;
+GUNICORN_WORKER_CLASS - gthread (WSGI, по умолчанию) или asgi (uvicorn);
+GUNICORN_WORKERS - количество воркеров, по умолчанию 2 * CPU + 1;
+GUNICORN_THREADS - количество потоков воркера gthread;
+DB_MAX_CONNECTIONS - соединения с PostgreSQL на все воркеры, по умолчанию 80.
+
+Каждый воркер держит постоянные соединения (CONN_MAX_AGE):
+по одному на поток запросов (threads для gthread, один поток
+синхронного кода для asgi) и на поток пула core.async_db.
+Всего соединений workers * (потоки запросов + ASYNC_DB_WORKERS),
+поэтому потоки и пул по умолчанию делят DB_MAX_CONNECTIONS
+между воркерами; сумма должна быть меньше max_connections PostgreSQL.
+GUNICORN_MAX_REQUESTS - перезапуск воркера после этого числа запросов.
+"""
+
+import multiprocessing
+import os
+import time
+
+# Время загрузки конфигурации - точка отсчета времени старта.
+STARTED = time.monotonic()
+
+# Класс воркеров и приложение для каждого варианта развертывания.
+WORKER_CLASSES = {
+    'asgi': ('uvicorn.workers.UvicornWorker', 'backend.asgi:application'),
+    'gthread': ('gthread', 'backend.wsgi:application'),
+}
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8080')
+# По умолчанию WSGI: в Django 3.2 под ASGI все синхронные представления
+# воркера (действия вьюсетов, пользователи, подписки) выполняются
+# в одном потоке, асинхронные версии есть только у части эндпоинтов.
+worker_class, wsgi_app = WORKER_CLASSES[
+    os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+]
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+
+# Бюджет соединений с БД на воркер: max_connections PostgreSQL
+# по умолчанию 100, часть оставлена для миграций, админки и psql.
+db_connections = max(
+    int(os.getenv('DB_MAX_CONNECTIONS', 80)) // workers, 2
+)
+threads = int(os.getenv('GUNICORN_THREADS', min(4, db_connections - 1)))
+request_connections = threads if worker_class == 'gthread' else 1
+# Пул core.async_db получает оставшиеся соединения воркера,
+# но не больше MAX_ASYNC_DB_WORKERS потоков.
+# Настройки Django читаются после этого модуля (preload_app).
+MAX_ASYNC_DB_WORKERS = 16
+os.environ.setdefault('ASYNC_DB_WORKERS', str(min(
+    max(db_connections - request_connections, 1), MAX_ASYNC_DB_WORKERS
+)))
+
+# Воркеры периодически перезапускаются, разброс не дает
+# им перезапуститься одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Приложение загружается в главном процессе до форка:
+# воркеры стартуют быстрее и разделяют память с главным процессом.
+preload_app = True
+
+
+def when_ready(server):
+    """
+    Прогревает шрифты и справочники до запуска воркеров
+    и выводит время старта сервера.
+    """
+    from core.startup import warm_up
+
+    warm_up()
+    server.log.info(
+        'Приложение загружено за %.2f с.', time.monotonic() - STARTED
+    )
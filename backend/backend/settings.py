@@ -7,7 +7,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv('SECRET_KEY')
 
-DEBUG = os.getenv('DEBUG')
+DEBUG = os.getenv('DEBUG', 'False').lower() in ('true', '1', 'yes')
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS').split(',')
 
@@ -25,9 +25,18 @@ THIRD_PARTY_APPS = [
     'rest_framework.authtoken',
     'djoser',
     'django_filters',
+]
+
+# Приложения и middleware только для разработки,
+# в production (DEBUG=False) они не подключаются.
+DEBUG_APPS = [
     'debug_toolbar',
 ]
 
+DEBUG_MIDDLEWARE = [
+    'debug_toolbar.middleware.DebugToolbarMiddleware',
+]
+
 LOCAL_APPS = [
     'api.apps.ApiConfig',
     'users.apps.UsersConfig',
@@ -38,6 +47,7 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'core.db.metrics.connection_metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,9 +55,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS += DEBUG_APPS
+    MIDDLEWARE += DEBUG_MIDDLEWARE
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -73,14 +86,26 @@ TEMPLATES = [
 WSGI_APPLICATION = 'backend.wsgi.application'
 
 
+# Пул соединений перед PostgreSQL: при DB_POOLER=pgbouncer
+# (режим transaction pooling) серверные курсоры отключаются,
+# так как курсор не переживает смену серверного соединения.
+DB_POOLER = os.getenv('DB_POOLER', '')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Соединение используется повторно до CONN_MAX_AGE секунд
+        # и проверяется перед первым запросом к БД в каждом запросе.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', 'True'
+        ).lower() in ('true', '1', 'yes'),
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOLER == 'pgbouncer',
     }
 }
 
@@ -120,6 +145,59 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media/'
 
+# Количество потоков для обработки загруженных картинок.
+# При 0 картинки обрабатываются сразу в потоке запроса.
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+
+# Количество потоков для запросов к БД из асинхронных представлений.
+# У каждого потока свое постоянное соединение; под gunicorn значение
+# по умолчанию вычисляется из DB_MAX_CONNECTIONS (backend/gunicorn_config.py).
+ASYNC_DB_WORKERS = int(os.getenv('ASYNC_DB_WORKERS', 8))
+
+# Асинхронные версии списка и страницы рецепта (api/async_views.py).
+# Включаются в backend/asgi.py: под WSGI каждый запрос к ним проходил бы
+# через async_to_sync и занимал соединение из пула core.async_db.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() in (
+    'true', '1', 'yes'
+)
+
+# Кэш Django: по умолчанию в памяти процесса,
+# в продакшене - Redis (CACHE_BACKEND=django_redis.cache.RedisCache,
+# CACHE_LOCATION=redis://redis:6379/1).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Кэш в памяти процесса: сброс в одном воркере gunicorn
+# не доходит до остальных.
+LOCAL_CACHE = CACHES['default']['BACKEND'] == (
+    'django.core.cache.backends.locmem.LocMemCache'
+)
+
+# Время жизни закэшированных связей пользователя (избранное, список
+# покупок, подписки). Без общего кэша связи хранятся несколько секунд,
+# чтобы воркеры быстро увидели изменения, сделанные в других воркерах.
+USER_RELATIONS_CACHE_TIMEOUT = int(os.getenv(
+    'USER_RELATIONS_CACHE_TIMEOUT', 5 if LOCAL_CACHE else 24 * 60 * 60
+))
+
+# Время жизни закэшированных ответов для анонимных пользователей.
+# Без общего кэша сброс не доходит до других воркеров,
+# поэтому ответы хранятся несколько секунд.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv(
+    'RESPONSE_CACHE_TIMEOUT', 5 if LOCAL_CACHE else 5 * 60
+))
+
+# Время жизни версии справочников тегов и ингредиентов.
+# С общим кэшем версия хранится бессрочно и меняется при изменении
+# справочника, без него - истекает, и воркеры перечитывают справочник.
+CATALOG_VERSION_TIMEOUT = 5 if LOCAL_CACHE else None
+
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Возвращает пул потоков для запросов к БД из асинхронного кода."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_WORKERS,
+                thread_name_prefix='async-db',
+            )
+    return _executor
+
+
+def database_sync_to_async(func):
+    """
+    Превращает синхронную функцию, работающую с ORM, в корутину.
+    ORM Django 3.2 синхронный, поэтому функция выполняется в пуле
+    потоков get_executor, а не в единственном потоке, в котором
+    sync_to_async(thread_sensitive=True) выполняет весь синхронный код
+    процесса. У каждого потока пула свое соединение с БД, устаревшие
+    соединения закрываются до и после вызова, как в конце запроса.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(
+        wrapper, thread_sensitive=False, executor=get_executor()
+    )
+
+
+def cache_sync_to_async(func):
+    """
+    Превращает обращение к кэшу Django в корутину. Клиенты кэша
+    потокобезопасны и не используют соединение с БД, поэтому
+    вызов выполняется в общем пуле потоков цикла событий.
+    """
+    return sync_to_async(func, thread_sensitive=False)
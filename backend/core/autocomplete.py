@@ -0,0 +1,109 @@
+import threading
+from bisect import bisect_left
+from functools import lru_cache, partial
+
+from core.catalog import ingredient_catalog
+from core.constants import (AUTOCOMPLETE_CACHE_SIZE,
+                            AUTOCOMPLETE_SIMILARITY_THRESHOLD)
+
+
+def get_trigrams(text):
+    """
+    Возвращает множество триграмм строки так же, как это делает
+    расширение pg_trgm: каждое слово дополняется двумя пробелами
+    в начале и одним в конце.
+    """
+    trigrams = set()
+    for word in text.split():
+        word = f'  {word} '
+        trigrams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return trigrams
+
+
+def find_ingredients(ingredients, names, trigrams, query, limit):
+    """
+    Ищет ингредиенты в отсортированном по названию списке.
+    Сначала идут совпадения по префиксу, затем по подстроке,
+    затем похожие по триграммам названия.
+    Параметры функции:
+    1) ingredients - отсортированный список ингредиентов;
+    2) names - названия ингредиентов в нижнем регистре;
+    3) trigrams - триграммы названий;
+    4) query - строка запроса в нижнем регистре;
+    5) limit - максимальное количество результатов.
+    """
+    if not query:
+        return tuple(ingredients[:limit])
+    found = []
+    for index in range(bisect_left(names, query), len(names)):
+        if len(found) == limit or not names[index].startswith(query):
+            break
+        found.append(index)
+    if len(found) < limit:
+        contains = []
+        for index, name in enumerate(names):
+            position = name.find(query)
+            if position > 0:
+                contains.append((position, index))
+        contains.sort()
+        found.extend(index for _, index in contains[:limit - len(found)])
+    if len(found) < limit:
+        query_trigrams = get_trigrams(query)
+        exclude = set(found)
+        similar = []
+        for index, name_trigrams in enumerate(trigrams):
+            if index in exclude:
+                continue
+            similarity = len(query_trigrams & name_trigrams) / len(
+                query_trigrams | name_trigrams
+            )
+            if similarity >= AUTOCOMPLETE_SIMILARITY_THRESHOLD:
+                similar.append((-similarity, index))
+        similar.sort()
+        found.extend(index for _, index in similar[:limit - len(found)])
+    return tuple(ingredients[index] for index in found)
+
+
+class IngredientAutocomplete:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+    Строится по справочнику ingredient_catalog и перестраивается
+    при смене его версии. Ингредиенты хранятся отсортированными
+    по названию, поэтому поиск по префиксу выполняется бинарным поиском.
+    Результаты частых запросов дополнительно кэшируются.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._version = None
+        self._search = None
+
+    def load(self, ingredients, version):
+        """Строит индекс и сбрасывает кэш запросов."""
+        ingredients = sorted(
+            ingredients, key=lambda ingredient: ingredient['name'].lower()
+        )
+        names = [ingredient['name'].lower() for ingredient in ingredients]
+        trigrams = [get_trigrams(name) for name in names]
+        self._search = lru_cache(maxsize=AUTOCOMPLETE_CACHE_SIZE)(
+            partial(find_ingredients, ingredients, names, trigrams)
+        )
+        self._version = version
+
+    def search(self, query, limit):
+        """
+        Возвращает не более limit ингредиентов, подходящих под запрос.
+        Параметры метода:
+        1) query - начало или часть названия ингредиента;
+        2) limit - максимальное количество результатов.
+        """
+        _, ingredients, version = self.catalog.load()
+        with self._lock:
+            if version != self._version:
+                self.load(ingredients, version)
+            search = self._search
+        return search(query.strip().lower(), limit)
+
+
+ingredient_autocomplete = IngredientAutocomplete(ingredient_catalog)
@@ -0,0 +1,102 @@
+from django.db.models import F, Sum
+
+from recipes.models import RecipeIngredient, ShoppingCartItem, ShoppingList
+from users.models import User
+
+
+def get_cart_lines(user):
+    """
+    Строки списка покупок пользователя: название ингредиента,
+    единица измерения и суммарное количество (name, measurement_unit,
+    ingredient_sum), отсортированные по названию.
+    Название ингредиента уникально и имеет одну единицу измерения,
+    поэтому строка соответствует одной записи ShoppingCartItem.
+    """
+    return ShoppingCartItem.objects.filter(user=user).values(
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+        ingredient_sum=F('amount'),
+    ).order_by('name')
+
+
+def get_cart_totals(recipe_ingredient_model, **filters):
+    """
+    Суммы ингредиентов в списках покупок пользователей:
+    строки (id пользователя, id ингредиента, количество).
+    """
+    return recipe_ingredient_model.objects.filter(
+        recipe__shoppinglist__isnull=False, **filters
+    ).values_list(
+        'recipe__shoppinglist__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def refresh_cart(user_ids, ingredient_ids=None):
+    """
+    Пересчитывает строки ShoppingCartItem пользователей user_ids
+    для ингредиентов ingredient_ids (для всех, если не заданы).
+    Пересчет идемпотентен, а строки пользователей блокируются,
+    поэтому параллельные изменения не искажают суммы.
+    Вызывается внутри транзакции.
+    """
+    list(User.objects.select_for_update().filter(
+        pk__in=user_ids
+    ).order_by('pk').values_list('pk', flat=True))
+    items = ShoppingCartItem.objects.filter(user_id__in=user_ids)
+    filters = {'recipe__shoppinglist__user_id__in': user_ids}
+    if ingredient_ids is not None:
+        items = items.filter(ingredient_id__in=ingredient_ids)
+        filters['ingredient_id__in'] = ingredient_ids
+    items.delete()
+    ShoppingCartItem.objects.bulk_create(
+        ShoppingCartItem(user_id=user_id, ingredient_id=ingredient_id,
+                         amount=total)
+        for user_id, ingredient_id, total in get_cart_totals(
+            RecipeIngredient, **filters
+        )
+    )
+
+
+def refresh_cart_for_recipes(user_id, recipe_ids):
+    """
+    Обновляет список покупок пользователя после добавления
+    или удаления рецептов recipe_ids. Пересчитываются только
+    ингредиенты этих рецептов; если ингредиентов уже нет
+    (рецепт удаляется), пересчитывается весь список.
+    """
+    ingredient_ids = list(RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', flat=True).distinct())
+    refresh_cart([user_id], ingredient_ids or None)
+
+
+def refresh_recipe_carts(recipe_id, ingredient_ids):
+    """
+    Обновляет списки покупок, в которых есть рецепт recipe_id,
+    после изменения его ингредиентов ingredient_ids.
+    """
+    user_ids = list(ShoppingList.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True))
+    if user_ids and ingredient_ids:
+        refresh_cart(user_ids, ingredient_ids)
+
+
+def rebuild_shopping_carts(cart_model, recipe_ingredient_model):
+    """
+    Полностью пересобирает таблицу ShoppingCartItem.
+    Модели передаются параметрами, чтобы функцию можно было
+    вызвать из миграции. Возвращает количество строк.
+    """
+    cart_model.objects.all().delete()
+    items = cart_model.objects.bulk_create(
+        (
+            cart_model(user_id=user_id, ingredient_id=ingredient_id,
+                       amount=total)
+            for user_id, ingredient_id, total in get_cart_totals(
+                recipe_ingredient_model
+            )
+        ),
+        batch_size=1000,
+    )
+    return len(items)
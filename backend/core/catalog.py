@@ -0,0 +1,150 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from recipes.models import Ingredient, Tag
+
+
+class Catalog:
+    """
+    Кэш справочника (тегов или ингредиентов) в памяти процесса.
+    Версия справочника хранится в общем кэше Django и меняется
+    при каждом изменении модели, поэтому процессы перечитывают
+    справочник из БД только после его изменения. Без общего кэша
+    версия истекает через CATALOG_VERSION_TIMEOUT секунд.
+    ETag строится по содержимому справочника и совпадает
+    во всех процессах, которые прочитали одни и те же данные.
+    Параметры:
+    1) model - модель справочника;
+    2) fields - поля, которые отдаются в API.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.cache_key = f'catalog_version:{model._meta.label_lower}'
+        self._lock = threading.Lock()
+        self._cache_version = None
+        self._version = None
+        self._modified = None
+        self._objects = {}
+        self._rows = []
+
+    def __deepcopy__(self, memo):
+        # Справочник общий для процесса: поля сериализаторов,
+        # которые копируются при создании, должны ссылаться на него же.
+        return self
+
+    def get_version(self):
+        """
+        Возвращает словарь с версией справочника и временем
+        его последнего изменения.
+        """
+        version = cache.get(self.cache_key)
+        if version is None:
+            cache.add(
+                self.cache_key, self._new_version(),
+                settings.CATALOG_VERSION_TIMEOUT,
+            )
+            version = cache.get(self.cache_key)
+        return version
+
+    def invalidate(self):
+        """Меняет версию справочника во всех процессах."""
+        cache.set(
+            self.cache_key, self._new_version(),
+            settings.CATALOG_VERSION_TIMEOUT,
+        )
+
+    def _new_version(self):
+        return {'version': time.time_ns(), 'modified': timezone.now()}
+
+    def load(self):
+        """
+        Возвращает словарь объектов по первичному ключу,
+        сериализованный справочник и хэш его содержимого.
+        Перечитывает справочник из БД, если версия изменилась.
+        """
+        version = self.get_version()
+        with self._lock:
+            if version['version'] != self._cache_version:
+                objects = list(self.model.objects.order_by('pk'))
+                self._objects = {obj.pk: obj for obj in objects}
+                self._rows = [
+                    {field: getattr(obj, field) for field in self.fields}
+                    for obj in objects
+                ]
+                digest = hashlib.sha256(
+                    json.dumps(self._rows).encode()
+                ).hexdigest()
+                if digest != self._version:
+                    self._version = digest
+                    self._modified = version['modified']
+                self._cache_version = version['version']
+            return self._objects, self._rows, self._version
+
+    def list(self):
+        """Возвращает сериализованный справочник."""
+        return self.load()[1]
+
+    def get(self, pk):
+        """Возвращает объект модели по первичному ключу или None."""
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        return self.load()[0].get(pk)
+
+    def existing_pks(self, pks):
+        """
+        Возвращает множество первичных ключей из pks, для которых
+        существуют объекты. Ключи, которых нет в кэше, проверяются
+        в БД одним запросом.
+        """
+        objects = self.load()[0]
+        existing = {pk for pk in pks if pk in objects}
+        unknown = set(pks) - existing
+        if unknown:
+            existing.update(self.model.objects.filter(
+                pk__in=unknown
+            ).values_list('pk', flat=True))
+        return existing
+
+    def get_row(self, pk):
+        """Возвращает сериализованный объект по первичному ключу или None."""
+        obj = self.get(pk)
+        if obj is None:
+            return None
+        return {field: getattr(obj, field) for field in self.fields}
+
+    def etag(self, request, *args, **kwargs):
+        """ETag ответа для декоратора condition."""
+        return f'{self.cache_key}:{self.load()[2]}'
+
+    def last_modified(self, request, *args, **kwargs):
+        """
+        Last-Modified ответа для декоратора condition:
+        время версии, с которой содержимое справочника изменилось.
+        """
+        self.load()
+        return self._modified
+
+
+def filter_by_name(rows, name):
+    """
+    Оставляет строки справочника, название которых
+    начинается с name без учета регистра.
+    """
+    if not name:
+        return rows
+    name = name.lower()
+    return [row for row in rows if row['name'].lower().startswith(name)]
+
+
+tag_catalog = Catalog(Tag, ('id', 'name', 'slug'))
+ingredient_catalog = Catalog(Ingredient, ('id', 'name', 'measurement_unit'))
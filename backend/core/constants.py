@@ -5,3 +5,30 @@ INGREDIENT_NAME_MAX_LENGTH = 128
 MEASUREMENT_UNIT_MAX_LENGTH = 64
 RECIPE_NAME_MAX_LENGTH = 256
 REGEX_VALID = r'^[\w.@+-]+$'
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_CACHE_SIZE = 1024
+AUTOCOMPLETE_SIMILARITY_THRESHOLD = 0.3
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_DECODE_CHUNK_SIZE = 64 * 1024
+IMAGE_FORMAT = 'WEBP'
+IMAGE_EXTENSION = 'webp'
+# Форматы, в которых основная картинка пережимается под исходным именем.
+IMAGE_SOURCE_FORMATS = ('JPEG', 'PNG', 'WEBP')
+# Максимальный размер стороны и качество сжатия для каждого варианта.
+RECIPE_IMAGE_TIER = (1280, 85)
+RECIPE_THUMBNAIL_TIER = (400, 75)
+AVATAR_TIER = (256, 80)
+# Конфигурация полнотекстового поиска рецептов в PostgreSQL.
+RECIPE_SEARCH_CONFIG = 'russian'
+# Минимальная доля имеющихся ингредиентов рецепта для поиска по продуктам.
+MIN_COVERAGE_DEFAULT = 0.5
+# Алфавит и длины частей коротких ссылок на рецепты.
+SHORT_LINK_ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+)
+SHORT_LINK_MIN_ID_LENGTH = 2
+SHORT_LINK_CHECKSUM_LENGTH = 2
+# Максимальное количество id в одном запросе массовых эндпоинтов.
+BULK_MAX_SIZE = 100
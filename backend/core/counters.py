@@ -0,0 +1,56 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorites, Recipe, ShoppingList
+from users.models import Subscription, User
+
+# Денормализованные счетчики: модель, строки которой считаются,
+# поле связи с владельцем счетчика, модель владельца и поле счетчика.
+COUNTERS = (
+    (Favorites, 'recipe_id', Recipe, 'favorites_count'),
+    (ShoppingList, 'recipe_id', Recipe, 'shopping_cart_count'),
+    (Recipe, 'author_id', User, 'recipes_count'),
+    (Subscription, 'author_id', User, 'followers_count'),
+)
+
+
+def change_counter(model, pks, field, delta):
+    """
+    Изменяет счетчик field на delta у объектов model
+    с первичными ключами из pks одним запросом.
+    Счетчик не опускается ниже нуля.
+    """
+    return model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def count_subquery(model, field):
+    """
+    Подзапрос с количеством строк model,
+    ссылающихся через field на внешний объект.
+    """
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def rebuild_recipe_counters(recipe_model, favorites_model,
+                            shopping_list_model):
+    """Пересчитывает счетчики рецептов по данным в БД."""
+    return recipe_model.objects.update(
+        favorites_count=count_subquery(favorites_model, 'recipe'),
+        shopping_cart_count=count_subquery(shopping_list_model, 'recipe'),
+    )
+
+
+def rebuild_user_counters(user_model, recipe_model, subscription_model):
+    """Пересчитывает счетчики пользователей по данным в БД."""
+    return user_model.objects.update(
+        recipes_count=count_subquery(recipe_model, 'author'),
+        followers_count=count_subquery(subscription_model, 'author'),
+    )
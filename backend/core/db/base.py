@@ -0,0 +1,61 @@
+"""
+Бэкенд PostgreSQL с проверкой постоянных соединений
+и замером времени получения соединения.
+Подключается в DATABASES как ENGINE = 'core.db'.
+"""
+
+import time
+
+from django.db.backends.postgresql import base
+
+from core.db.metrics import record_acquisition
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Соединение с PostgreSQL. При CONN_HEALTH_CHECKS = True постоянное
+    соединение (CONN_MAX_AGE) проверяется перед первым использованием
+    в запросе, и оборванное соединение открывается заново,
+    а не приводит к ошибке запроса (аналог CONN_HEALTH_CHECKS Django 4.1).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = self.settings_dict.get(
+            'CONN_HEALTH_CHECKS', False
+        )
+        self.health_check_done = False
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        self.health_check_done = True
+        record_acquisition(started)
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце каждого запроса:
+        # соединение, пережившее запрос, нужно проверить заново.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        """
+        Закрывает соединение, если оно не отвечает, чтобы курсор
+        получил новое. Внутри транзакции соединение не проверяется.
+        """
+        if (
+            self.connection is None
+            or not self.health_check_enabled
+            or self.health_check_done
+            or self.in_atomic_block
+        ):
+            return
+        started = time.perf_counter()
+        self.health_check_done = True
+        if not self.is_usable():
+            self.close()
+        record_acquisition(started)
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
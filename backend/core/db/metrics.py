@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+# Статистика получения соединений с БД для текущего запроса.
+# Контекст копируется в потоки sync_to_async, поэтому
+# соединения из пула core.async_db учитываются в том же запросе.
+connection_stats = ContextVar('connection_stats', default=None)
+
+
+class ConnectionStats:
+    """Количество и суммарное время получения соединений с БД."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def add(self, duration):
+        self.count += 1
+        self.duration += duration
+
+
+def record_acquisition(started):
+    """
+    Учитывает получение соединения (открытие или проверку
+    соединения), начатое в момент started по time.perf_counter.
+    """
+    stats = connection_stats.get()
+    if stats is not None:
+        stats.add(time.perf_counter() - started)
+
+
+def finish_request(request, response, stats):
+    """
+    Пишет статистику в лог, а в режиме DEBUG или для адресов
+    из INTERNAL_IPS добавляет ее в заголовок Server-Timing.
+    """
+    duration = stats.duration * 1000
+    if (
+        settings.DEBUG
+        or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+    ):
+        response['Server-Timing'] = (
+            f'db-connect;dur={duration:.2f};desc="{stats.count}"'
+        )
+    if stats.count:
+        logger.debug(
+            '%s %s: соединений с БД получено %d за %.2f мс.',
+            request.method, request.path, stats.count, duration
+        )
+    return response
+
+
+@sync_and_async_middleware
+def connection_metrics_middleware(get_response):
+    """
+    Middleware, которое измеряет время получения соединений с БД
+    за запрос. Время считается бэкендом core.db.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats = ConnectionStats()
+            token = connection_stats.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                connection_stats.reset(token)
+            return finish_request(request, response, stats)
+    else:
+        def middleware(request):
+            stats = ConnectionStats()
+            token = connection_stats.set(stats)
+            try:
+                response = get_response(request)
+            finally:
+                connection_stats.reset(token)
+            return finish_request(request, response, stats)
+    return middleware
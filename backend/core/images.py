@@ -0,0 +1,172 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+
+from PIL import Image, ImageOps
+
+from core.constants import (AVATAR_TIER, IMAGE_EXTENSION, IMAGE_FORMAT,
+                            IMAGE_SOURCE_FORMATS, RECIPE_IMAGE_TIER,
+                            RECIPE_THUMBNAIL_TIER)
+from core.response_cache import recipe_response_cache
+from recipes.models import Recipe
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Возвращает пул потоков для обработки картинок."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='image-processing',
+            )
+    return _executor
+
+
+def open_image(field_file):
+    """Открывает сохраненную картинку с учетом ориентации из EXIF."""
+    with field_file.open('rb'):
+        image = ImageOps.exif_transpose(Image.open(field_file))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    return image
+
+
+def compress(image, tier, image_format=IMAGE_FORMAT):
+    """
+    Уменьшает картинку и сжимает ее с заданным качеством.
+    Параметры функции:
+    1) image - объект PIL.Image;
+    2) tier - максимальный размер стороны и качество сжатия;
+    3) image_format - формат сохраняемой картинки.
+    """
+    max_side, quality = tier
+    image = image.copy()
+    image.thumbnail((max_side, max_side))
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=quality)
+    return ContentFile(buffer.getvalue())
+
+
+def get_image_format(name):
+    """Формат PIL по расширению файла или None."""
+    extension = os.path.splitext(name)[1].lower()
+    return Image.registered_extensions().get(extension)
+
+
+def shrink_in_place(field_file, image, tier):
+    """
+    Заменяет картинку уменьшенной и пережатой копией в том же формате
+    и под тем же именем, поэтому уже выданные ссылки остаются рабочими.
+    Копия сохраняется во временный файл и атомарно заменяет исходный.
+    Картинки в форматах не из IMAGE_SOURCE_FORMATS не меняются.
+    """
+    image_format = get_image_format(field_file.name)
+    if image_format not in IMAGE_SOURCE_FORMATS:
+        return
+    storage = field_file.storage
+    temp_name = storage.save(
+        field_file.name, compress(image, tier, image_format)
+    )
+    os.replace(storage.path(temp_name), storage.path(field_file.name))
+
+
+def save_variant(field_file, instance, image, tier, source_name):
+    """
+    Сохраняет обработанный вариант картинки в поле field_file
+    под именем исходного файла source_name и возвращает имя варианта.
+    """
+    base_name = os.path.splitext(os.path.basename(source_name))[0]
+    name = field_file.field.generate_filename(
+        instance, f'{base_name}.{IMAGE_EXTENSION}'
+    )
+    return field_file.storage.save(name, compress(image, tier))
+
+
+def delete_files(storage, *names):
+    """Удаляет файлы из хранилища, пропуская пустые имена."""
+    for name in names:
+        if name:
+            storage.delete(name)
+
+
+def process_recipe_image(recipe_id, image_name):
+    """
+    Пережимает картинку рецепта под тем же именем и создает миниатюру.
+    Если картинку рецепта успели заменить, миниатюра удаляется.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id, image=image_name).first()
+    if recipe is None:
+        return
+    image = open_image(recipe.image)
+    shrink_in_place(recipe.image, image, RECIPE_IMAGE_TIER)
+    thumbnail = save_variant(
+        recipe.thumbnail, recipe, image, RECIPE_THUMBNAIL_TIER, image_name
+    )
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        thumbnail=thumbnail
+    )
+    if updated:
+        recipe_response_cache.invalidate()
+        delete_files(recipe.thumbnail.storage, recipe.thumbnail.name)
+    else:
+        delete_files(recipe.thumbnail.storage, thumbnail)
+
+
+def process_avatar(user_id, avatar_name):
+    """Пережимает аватар пользователя под тем же именем."""
+    user = User.objects.filter(pk=user_id, avatar=avatar_name).first()
+    if user is None:
+        return
+    shrink_in_place(user.avatar, open_image(user.avatar), AVATAR_TIER)
+
+
+def run_task(func, *args):
+    """Выполняет обработку в потоке пула и логирует ошибки."""
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', args)
+    finally:
+        # Картинки обрабатываются редко: соединение потока
+        # не держится открытым и не расходует лимит соединений.
+        connections.close_all()
+
+
+def schedule(func, *args):
+    """
+    Запускает обработку картинки после фиксации транзакции.
+    Обработка выполняется в пуле потоков, а если пул отключен
+    настройкой IMAGE_PROCESSING_WORKERS, то сразу.
+    """
+    def submit():
+        if settings.IMAGE_PROCESSING_WORKERS:
+            get_executor().submit(run_task, func, *args)
+        else:
+            func(*args)
+    transaction.on_commit(submit)
+
+
+def schedule_recipe_image(recipe):
+    """Ставит в очередь обработку картинки рецепта."""
+    schedule(process_recipe_image, recipe.pk, recipe.image.name)
+
+
+def schedule_avatar(user):
+    """Ставит в очередь обработку аватара пользователя."""
+    schedule(process_avatar, user.pk, user.avatar.name)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.shortlinks import encode_short_link
+from recipes.models import ShortLinkRecipe
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """
+    Класс для перевода коротких ссылок на новый формат
+    по команде 'python manage.py backfill_short_links'.
+    Прежний код ссылки сохраняется в legacy_short_link,
+    поэтому уже выданные ссылки продолжают работать.
+    """
+
+    def handle(self, *args, **options):
+        links = ShortLinkRecipe.objects.only(
+            'id', 'recipe_id', 'short_link', 'legacy_short_link'
+        ).order_by('id')
+        updated = 0
+        batch = []
+        with transaction.atomic():
+            for link in links.iterator(chunk_size=BATCH_SIZE):
+                short_link = encode_short_link(link.recipe_id)
+                if link.short_link == short_link:
+                    continue
+                if link.legacy_short_link is None:
+                    link.legacy_short_link = link.short_link
+                link.short_link = short_link
+                batch.append(link)
+                if len(batch) == BATCH_SIZE:
+                    updated += self.save(batch)
+                    batch = []
+            updated += self.save(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено коротких ссылок: {updated}.'
+        ))
+
+    def save(self, batch):
+        ShortLinkRecipe.objects.bulk_update(
+            batch, ['short_link', 'legacy_short_link']
+        )
+        return len(batch)
@@ -0,0 +1,133 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from core.shortlinks import encode_short_link
+from recipes.models import Ingredient, Recipe, Tag
+
+DEFAULT_REQUESTS = 1000
+DEFAULT_CONCURRENCY = 50
+DEFAULT_TIMEOUT = 10
+
+
+def percentile(values, percent):
+    """Перцентиль отсортированного списка значений."""
+    index = max(math.ceil(len(values) * percent / 100) - 1, 0)
+    return values[index]
+
+
+class Command(BaseCommand):
+    """
+    Класс для нагрузочного сравнения развертываний по команде
+    'python manage.py benchmark_endpoints --target wsgi=http://host:8001
+    --target asgi=http://host:8002'.
+    Для каждого адреса и пути выводятся запросы в секунду,
+    задержки p50 и p99 и количество ошибок.
+    По умолчанию проверяются список и рецепт, теги,
+    ингредиенты и короткая ссылка первого рецепта из БД.
+    """
+
+    help = 'Сравнивает RPS и задержки нагруженных эндпоинтов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            help='Имя и адрес развертывания: name=http://host:port.',
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Путь для проверки, по умолчанию нагруженные эндпоинты.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=DEFAULT_REQUESTS,
+            help='Количество запросов к каждому пути.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+            help='Количество одновременных запросов.',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=DEFAULT_TIMEOUT,
+            help='Таймаут запроса в секундах.',
+        )
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            if not url:
+                raise CommandError(
+                    f'Адрес должен иметь вид name=http://host:port: {target}'
+                )
+            targets.append((name, url.rstrip('/')))
+        paths = options['paths'] or self.get_default_paths()
+        self.stdout.write(
+            f'{"target":<10}{"path":<40}{"rps":>10}'
+            f'{"p50, ms":>10}{"p99, ms":>10}{"errors":>8}'
+        )
+        for path in paths:
+            for name, url in targets:
+                rps, p50, p99, errors = self.run(
+                    url + path, options['requests'],
+                    options['concurrency'], options['timeout'],
+                )
+                self.stdout.write(
+                    f'{name:<10}{path:<40}{rps:>10.1f}'
+                    f'{p50:>10.1f}{p99:>10.1f}{errors:>8}'
+                )
+
+    def get_default_paths(self):
+        paths = ['/api/recipes/', '/api/tags/', '/api/ingredients/']
+        recipe_id = Recipe.objects.values_list('id', flat=True).first()
+        if recipe_id is not None:
+            paths += [
+                f'/api/recipes/{recipe_id}/',
+                f'/s/{encode_short_link(recipe_id)}/',
+            ]
+        tag_id = Tag.objects.values_list('id', flat=True).first()
+        if tag_id is not None:
+            paths.append(f'/api/tags/{tag_id}/')
+        ingredient_id = Ingredient.objects.values_list(
+            'id', flat=True
+        ).first()
+        if ingredient_id is not None:
+            paths.append(f'/api/ingredients/{ingredient_id}/')
+        return paths
+
+    def run(self, url, total, concurrency, timeout):
+        """
+        Выполняет total запросов к url в concurrency потоков.
+        Возвращает запросы в секунду, задержки p50 и p99
+        в миллисекундах и количество ошибок.
+        """
+        local = threading.local()
+
+        def fetch(_):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            started = time.perf_counter()
+            try:
+                response = local.session.get(
+                    url, timeout=timeout, allow_redirects=False
+                )
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        return (
+            total / elapsed,
+            percentile(latencies, 50),
+            percentile(latencies, 99),
+            errors,
+        )
@@ -0,0 +1,88 @@
+import time
+from itertools import combinations
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.http import QueryDict
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Класс для записи планов выполнения запросов ленты рецептов
+    по команде 'python manage.py explain_recipe_filters'.
+    Для каждой комбинации фильтров RecipeFilter записывается EXPLAIN
+    первой страницы ленты и среднее время выполнения запроса.
+    Запустите команду до и после изменения индексов
+    (например, 'migrate recipes 0004' и 'migrate recipes')
+    и сравните файлы, чтобы увидеть регрессии.
+    """
+    help = 'Записывает EXPLAIN запросов ленты рецептов для всех фильтров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='recipe_filters_explain.txt',
+            help='Файл, в который записываются планы запросов.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=10,
+            help='Сколько раз выполнять каждый запрос для замера времени.'
+        )
+
+    def get_filter_values(self):
+        """Подбирает значения фильтров по данным в БД."""
+        author = User.objects.order_by('-recipes_count').first()
+        user = User.objects.annotate(
+            favorites_amount=Count('favorites')
+        ).order_by('-favorites_amount').first()
+        tags = Tag.objects.annotate(
+            recipes_amount=Count('recipes')
+        ).order_by('-recipes_amount').values_list('slug', flat=True)[:2]
+        return user, {
+            'author': [str(author.pk)] if author else [],
+            'tags': list(tags),
+            'is_favorited': ['1'],
+            'is_in_shopping_cart': ['1'],
+        }
+
+    def handle(self, *args, **options):
+        user, values = self.get_filter_values()
+        request = SimpleNamespace(user=user)
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        explain_options = {}
+        if connection.vendor == 'postgresql':
+            explain_options = {'analyze': True, 'buffers': True}
+        names = list(values)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            for size in range(len(names) + 1):
+                for combination in combinations(names, size):
+                    data = QueryDict(mutable=True)
+                    for name in combination:
+                        data.setlist(name, values[name])
+                    queryset = RecipeFilter(
+                        data=data,
+                        queryset=Recipe.objects.all(),
+                        request=request,
+                    ).qs[:page_size]
+                    start = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        list(queryset.all())
+                    elapsed = (
+                        (time.perf_counter() - start)
+                        / options['repeat'] * 1000
+                    )
+                    title = data.urlencode() or 'без фильтров'
+                    file.write(f'== {title} ==\n')
+                    file.write(f'Среднее время: {elapsed:.2f} мс\n')
+                    file.write(queryset.explain(**explain_options))
+                    file.write('\n\n')
+                    self.stdout.write(f'{title}: {elapsed:.2f} мс')
+        self.stdout.write(self.style.SUCCESS(
+            f'Планы запросов записаны в {options["output"]}.'
+        ))
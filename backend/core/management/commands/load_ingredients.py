@@ -5,6 +5,7 @@ from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import IntegrityError
 
+from core.catalog import ingredient_catalog
 from recipes.models import Ingredient
 
 
@@ -28,6 +29,7 @@ class Command(BaseCommand):
                     )
                     for line in csv.DictReader(file)
                 )
+                ingredient_catalog.invalidate()
                 self.stdout.write(
                     self.style.SUCCESS('Ингредиенты успешно добавлены!')
                 )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.counters import rebuild_recipe_counters, rebuild_user_counters
+from recipes.models import Favorites, Recipe, ShoppingList
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    """
+    Класс для пересчета денормализованных счетчиков
+    по команде 'python manage.py rebuild_counters'.
+    """
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = rebuild_recipe_counters(
+                Recipe, Favorites, ShoppingList
+            )
+            users = rebuild_user_counters(User, Recipe, Subscription)
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчики пересчитаны: рецептов - {recipes}, '
+            f'пользователей - {users}.'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.cart import rebuild_shopping_carts
+from recipes.models import RecipeIngredient, ShoppingCartItem
+
+
+class Command(BaseCommand):
+    """
+    Класс для пересборки сумм ингредиентов в списках покупок
+    по команде 'python manage.py rebuild_shopping_carts'.
+    """
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            items = rebuild_shopping_carts(ShoppingCartItem, RecipeIngredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны: строк - {items}.'
+        ))
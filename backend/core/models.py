@@ -0,0 +1,26 @@
+class CounterFieldsMixin:
+    """
+    Примесь для моделей с денормализованными счетчиками.
+    Счетчики меняются только запросами UPDATE с F() (core.counters),
+    поэтому save() существующего объекта их не записывает: иначе
+    объект, загруженный до изменения счетчика, вернул бы старое значение.
+    Атрибут counter_fields - имена полей счетчиков.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            self.pk is not None
+            and not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            deferred_fields = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred_fields
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
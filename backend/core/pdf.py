@@ -0,0 +1,130 @@
+import hashlib
+import io
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+from reportlab import rl_config
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch, cm
+from reportlab.lib.utils import ImageReader
+
+from core.constants import SHOPPING_LIST_CACHE_TIMEOUT
+
+TEMPLATES_DIR = os.path.join(settings.BASE_DIR, 'api', 'templates')
+BACKGROUND_FORM = 'shopping_list_background'
+TITLE = 'Cписок покупок: '
+TITLE_FONT = ('Georgia', 18)
+ITEM_FONT = ('Gabriola', 16)
+# Отступы списка покупок, подобранные под фон Shopp_list.jpg.
+TITLE_Y = (letter[1] - 0.5 * inch) - 4.3 * cm
+FIRST_ITEM_Y = (letter[1] - 0.5 * inch) - 4.8 * cm
+LAST_ITEM_Y = 5.5 * cm
+ITEM_STEP = 0.2 * inch
+
+# Картинка фона встраивается в pdf как есть, без перекодирования
+# в ASCII85, которое занимает большую часть времени формирования файла.
+rl_config.useA85 = 0
+
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    """
+    Регистрирует шрифты для отображения кириллицы.
+    Выполняется один раз за время жизни процесса.
+    """
+    pdfmetrics.registerFont(
+        TTFont('Gabriola', os.path.join(TEMPLATES_DIR, 'gabriola.ttf'))
+    )
+    pdfmetrics.registerFont(
+        TTFont('Georgia', os.path.join(TEMPLATES_DIR, 'georgia.ttf'))
+    )
+
+
+@lru_cache(maxsize=None)
+def get_background():
+    """
+    Возвращает картинку фона.
+    Файл читается и декодируется один раз за время жизни процесса.
+    """
+    return ImageReader(os.path.join(TEMPLATES_DIR, 'Shopp_list.jpg'))
+
+
+@lru_cache(maxsize=4096)
+def string_width(text, font_name, font_size):
+    """Кэширует ширину строки для заданного шрифта."""
+    return pdfmetrics.stringWidth(text, font_name, font_size)
+
+
+def warm_up():
+    """Заранее загружает шрифты и фон, например до форка воркеров."""
+    register_fonts()
+    get_background()
+
+
+def draw_page(can, title=None):
+    """
+    Начинает страницу списка покупок: рисует фон из заранее
+    подготовленного шаблона и, если передан, заголовок.
+    """
+    can.doForm(BACKGROUND_FORM)
+    if title:
+        can.setFont(*TITLE_FONT)
+        x_title = (letter[0] - string_width(
+            ' '.join(title), TITLE_FONT[0], 22)) - 4.2 * cm
+        can.drawString(x_title, TITLE_Y, title)
+    can.setFont(*ITEM_FONT)
+
+
+def render_shopping_list(shopping_list):
+    """
+    Формирует pdf файл со списком покупок и возвращает его байты.
+    Фон сохраняется в документе один раз и переиспользуется на каждой
+    странице, длинные списки переносятся на следующие страницы.
+    Параметры функции:
+    1) shopping_list - список строк с ингредиентами и их количеством.
+    """
+    register_fonts()
+    packet = io.BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    can.beginForm(BACKGROUND_FORM)
+    can.drawImage(
+        get_background(), 0, 0, width=letter[0], height=letter[1]
+    )
+    can.endForm()
+    draw_page(can, TITLE)
+    y_ingredient = FIRST_ITEM_Y
+    for item in shopping_list:
+        if y_ingredient < LAST_ITEM_Y:
+            can.showPage()
+            draw_page(can)
+            y_ingredient = FIRST_ITEM_Y
+        x_ingredient = (letter[0] - string_width(
+            f' {item} ', ITEM_FONT[0], 18)) - 8.5 * cm
+        can.drawString(x_ingredient, y_ingredient, item)
+        y_ingredient -= ITEM_STEP
+    can.save()
+    return packet.getvalue()
+
+
+def get_shopping_list_pdf(shopping_list):
+    """
+    Возвращает pdf файл списка покупок.
+    Готовый файл кэшируется по хэшу содержимого списка,
+    поэтому повторное скачивание неизменной корзины не формирует
+    pdf заново.
+    """
+    digest = hashlib.sha256(
+        '\n'.join(shopping_list).encode()
+    ).hexdigest()
+    cache_key = f'shopping_list_pdf:{digest}'
+    pdf = cache.get(cache_key)
+    if pdf is None:
+        pdf = render_shopping_list(shopping_list)
+        cache.set(cache_key, pdf, SHOPPING_LIST_CACHE_TIMEOUT)
+    return pdf
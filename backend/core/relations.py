@@ -0,0 +1,233 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from core.cart import refresh_cart_for_recipes
+from core.counters import COUNTERS, change_counter
+from recipes.models import Favorites, ShoppingList
+from users.models import Subscription
+
+# Связи пользователя: вид связи, модель и поле с id связанного объекта.
+RELATIONS = (
+    ('favorites', Favorites, 'recipe_id'),
+    ('shopping_cart', ShoppingList, 'recipe_id'),
+    ('subscriptions', Subscription, 'author_id'),
+)
+
+
+def get_version_key(user_id, kind):
+    """Ключ версии закэшированного множества связей пользователя."""
+    return f'user_relations_version:{kind}:{user_id}'
+
+
+def get_cache_key(user_id, kind, version):
+    """Ключ кэша множества id связанных объектов пользователя."""
+    return f'user_relations:{kind}:{user_id}:{version}'
+
+
+def get_versions(user_id):
+    """
+    Возвращает словарь версий множеств связей пользователя.
+    Отсутствующие версии создаются.
+    """
+    keys = {get_version_key(user_id, kind): kind for kind, _, _ in RELATIONS}
+    versions = {
+        keys[key]: version for key, version in cache.get_many(keys).items()
+    }
+    for key, kind in keys.items():
+        if kind not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[kind] = cache.get(key)
+    return versions
+
+
+def load_relations(user):
+    """
+    Возвращает словарь множеств id избранных рецептов,
+    рецептов в списке покупок и авторов в подписках пользователя.
+    Множества читаются из общего кэша, отсутствующие загружаются
+    из БД и сохраняются в кэш под версией, прочитанной до запроса к БД:
+    если связи за это время изменились, версия уже сменилась,
+    и устаревшее множество сохраняется под неиспользуемым ключом.
+    """
+    versions = get_versions(user.pk)
+    keys = {
+        get_cache_key(user.pk, kind, versions[kind]): kind
+        for kind, _, _ in RELATIONS
+    }
+    relations = {
+        keys[key]: ids for key, ids in cache.get_many(keys).items()
+    }
+    missing = {}
+    for kind, model, field in RELATIONS:
+        if kind not in relations:
+            relations[kind] = frozenset(
+                model.objects.filter(user=user).values_list(field, flat=True)
+            )
+            missing[get_cache_key(user.pk, kind, versions[kind])] = (
+                relations[kind]
+            )
+    if missing:
+        cache.set_many(missing, settings.USER_RELATIONS_CACHE_TIMEOUT)
+    return relations
+
+
+def get_relation_ids(request, kind):
+    """
+    Возвращает множество id связанных объектов текущего пользователя.
+    Множества загружаются один раз за запрос, поэтому флаги
+    is_favorited, is_in_shopping_cart и is_subscribed
+    не требуют запросов к БД для каждой строки.
+    Параметры функции:
+    1) request - объект запроса;
+    2) kind - вид связи: favorites, shopping_cart или subscriptions.
+    """
+    if request is None or not request.user.is_authenticated:
+        return frozenset()
+    relations = getattr(request, '_user_relations', None)
+    if relations is None:
+        relations = load_relations(request.user)
+        request._user_relations = relations
+    return relations[kind]
+
+
+def invalidate_relations(user_id, kind):
+    """
+    Меняет версию множества связей пользователя
+    после фиксации транзакции.
+    """
+    transaction.on_commit(lambda: cache.set(
+        get_version_key(user_id, kind), time.time_ns(), None
+    ))
+
+
+def get_relation_kind(model):
+    """Вид связи для модели из RELATIONS."""
+    return next(kind for kind, related, _ in RELATIONS if related is model)
+
+
+def get_counter(model):
+    """
+    Поле связи, модель владельца и поле счетчика
+    для модели связи из COUNTERS.
+    """
+    return next(
+        (field, owner, counter) for counted, field, owner, counter in COUNTERS
+        if counted is model
+    )
+
+
+def execute_relation_sql(sql, model, user_id, recipe_id):
+    """
+    Выполняет запрос к таблице связи пользователя с рецептом
+    и возвращает количество затронутых строк.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(table=table), [user_id, recipe_id])
+        return cursor.rowcount
+
+
+def after_relation_change(model, user_id, pks, delta):
+    """
+    Обновляет счетчики связанных объектов с первичными ключами pks
+    и сбрасывает кэш связей пользователя, для списка покупок
+    также обновляет суммы ингредиентов. Сырые SQL-запросы
+    и bulk_create не отправляют сигналы, поэтому это делается явно.
+    """
+    _, owner_model, counter = get_counter(model)
+    change_counter(owner_model, pks, counter, delta)
+    invalidate_relations(user_id, get_relation_kind(model))
+    if model is ShoppingList:
+        refresh_cart_for_recipes(user_id, pks)
+
+
+def add_recipe_relation(model, user_id, recipe_id):
+    """
+    Добавляет рецепт в избранное или список покупок одним запросом
+    INSERT ... ON CONFLICT DO NOTHING, опираясь на ограничение
+    уникальности. Возвращает True, если строка добавлена.
+    Параметры функции:
+    1) model - модель Favorites или ShoppingList;
+    2) user_id - id пользователя;
+    3) recipe_id - id рецепта.
+    """
+    added = execute_relation_sql(
+        'INSERT INTO {table} (user_id, recipe_id) VALUES (%s, %s) '
+        'ON CONFLICT DO NOTHING',
+        model, user_id, recipe_id
+    ) == 1
+    if added:
+        after_relation_change(model, user_id, [recipe_id], 1)
+    return added
+
+
+def remove_recipe_relation(model, user_id, recipe_id):
+    """
+    Удаляет рецепт из избранного или списка покупок одним запросом
+    DELETE. Возвращает True, если строка удалена.
+    Параметры функции такие же, как у add_recipe_relation.
+    """
+    removed = execute_relation_sql(
+        'DELETE FROM {table} WHERE user_id = %s AND recipe_id = %s',
+        model, user_id, recipe_id
+    ) == 1
+    if removed:
+        after_relation_change(model, user_id, [recipe_id], -1)
+    return removed
+
+
+def bulk_add_relations(model, user_id, pks):
+    """
+    Добавляет связи пользователя со всеми объектами из pks одним
+    запросом INSERT ... ON CONFLICT DO NOTHING RETURNING. Счетчики
+    меняются только для добавленных строк: связи, которые успел
+    создать параллельный запрос, пропускаются.
+    Возвращает id объектов, связи с которыми добавлены.
+    Параметры функции:
+    1) model - модель Favorites, ShoppingList или Subscription;
+    2) user_id - id пользователя;
+    3) pks - id рецептов или авторов.
+    """
+    if not pks:
+        return []
+    values = ', '.join(['(%s, %s)'] * len(pks))
+    params = [param for pk in pks for param in (user_id, pk)]
+    field = connection.ops.quote_name(get_counter(model)[0])
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, {field}) VALUES {values} '
+            f'ON CONFLICT DO NOTHING RETURNING {field}',
+            params
+        )
+        added = [row[0] for row in cursor.fetchall()]
+    if added:
+        after_relation_change(model, user_id, added, 1)
+    return added
+
+
+def bulk_remove_relations(model, user_id, pks):
+    """
+    Удаляет связи пользователя со всеми объектами из pks одним
+    запросом DELETE ... RETURNING. Счетчики меняются только
+    для удаленных строк. Возвращает id объектов, связи с которыми
+    удалены. Параметры функции такие же, как у bulk_add_relations.
+    """
+    if not pks:
+        return []
+    placeholders = ', '.join(['%s'] * len(pks))
+    field = connection.ops.quote_name(get_counter(model)[0])
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE user_id = %s '
+            f'AND {field} IN ({placeholders}) RETURNING {field}',
+            [user_id, *pks]
+        )
+        removed = [row[0] for row in cursor.fetchall()]
+    if removed:
+        after_relation_change(model, user_id, removed, -1)
+    return removed
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ResponseCache:
+    """
+    Кэш ответов API для анонимных пользователей.
+    Кэшируются данные успешных GET-ответов, ключ строится по пути
+    и нормализованной строке запроса (параметры отсортированы).
+    Ключи содержат версию, которая хранится в общем кэше Django
+    и меняется при изменении данных, поэтому сброс кэша во всех
+    процессах - это одна запись.
+    Параметры:
+    1) name - имя группы закэшированных ответов.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.version_key = f'response_cache_version:{name}'
+
+    def get_version(self):
+        """Возвращает текущую версию кэша."""
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time_ns(), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def invalidate(self):
+        """
+        Сбрасывает кэш после фиксации текущей транзакции,
+        чтобы параллельные запросы не закэшировали старые данные.
+        """
+        transaction.on_commit(
+            lambda: cache.set(self.version_key, time.time_ns(), None)
+        )
+
+    def make_key(self, request):
+        """Ключ кэша для запроса."""
+        query = urlencode(sorted(
+            (key, value)
+            for key, values in request.GET.lists()
+            for value in values
+        ))
+        digest = hashlib.sha256(
+            f'{request.get_host()}{request.path}?{query}'.encode()
+        ).hexdigest()
+        return f'response_cache:{self.name}:{self.get_version()}:{digest}'
+
+    def get_cached(self, request):
+        """
+        Возвращает закэшированные данные ответа для запроса Django
+        до аутентификации DRF или None. Запрос считается анонимным,
+        если в нем нет заголовка Authorization.
+        """
+        if request.method != 'GET' or 'HTTP_AUTHORIZATION' in request.META:
+            return None
+        return cache.get(self.make_key(request))
+
+    def __call__(self, view_method):
+        """Декоратор для методов вьюсета."""
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view_method(view, request, *args, **kwargs)
+            key = self.make_key(request)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+            response = view_method(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+
+
+recipe_response_cache = ResponseCache('recipes')
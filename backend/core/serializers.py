@@ -1,25 +1,110 @@
 import base64
+import binascii
+from tempfile import SpooledTemporaryFile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
 
 from rest_framework import serializers
 
+from core.constants import (BULK_MAX_SIZE, IMAGE_DECODE_CHUNK_SIZE,
+                            IMAGE_UPLOAD_MAX_SIZE)
 from recipes.models import Recipe
 
 
+def decode_base64_file(data, name):
+    """
+    Декодирует base64 строку частями во временный файл,
+    который при большом размере хранится на диске, а не в памяти.
+    Параметры функции:
+    1) data - строка с картинкой в base64;
+    2) name - имя файла.
+    """
+    file = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    # Переносы строк и пробелы допустимы в base64, но сдвигают
+    # границы частей, поэтому удаляются до декодирования.
+    data = ''.join(data.split())
+    for start in range(0, len(data), IMAGE_DECODE_CHUNK_SIZE):
+        file.write(base64.b64decode(
+            data[start:start + IMAGE_DECODE_CHUNK_SIZE], validate=True
+        ))
+    file.seek(0)
+    return File(file, name=name)
+
+
 class Base64ImageField(serializers.ImageField):
     """Кастомный класс для поля картинки."""
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
+            if len(imgstr) * 3 // 4 > IMAGE_UPLOAD_MAX_SIZE:
+                raise serializers.ValidationError(
+                    'Размер картинки не должен превышать '
+                    f'{IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} Мб!'
+                )
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            try:
+                data = decode_base64_file(imgstr, 'temp.' + ext)
+            except binascii.Error:
+                raise serializers.ValidationError(
+                    'Картинка должна быть в кодировке base64!'
+                )
         return super().to_internal_value(data)
 
 
+class ThumbnailField(serializers.ImageField):
+    """
+    Поле миниатюры картинки рецепта.
+    Пока миниатюра не создана, отдается исходная картинка.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            value = value.instance.image
+        return super().to_representation(value)
+
+
+class CatalogPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Кастомный класс для поля первичного ключа.
+    Ищет объект в кэше справочника и обращается к БД,
+    только если объекта в кэше нет.
+    """
+    def __init__(self, catalog, **kwargs):
+        self.catalog = catalog
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        # Catalog.get приводит ключ через int(), который превратил бы
+        # True и 1.7 в 1, поэтому такие значения отклоняются заранее.
+        if isinstance(data, bool) or (
+            isinstance(data, float) and not data.is_integer()
+        ):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.catalog.get(data)
+        if obj is None:
+            return super().to_internal_value(data)
+        return obj
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Укороченный сериализатор рецептов."""
+    thumbnail = ThumbnailField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnail', 'cooking_time')
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id для массовых эндпоинтов."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_SIZE,
+    )
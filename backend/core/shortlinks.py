@@ -0,0 +1,53 @@
+import hashlib
+
+from core.constants import (SHORT_LINK_ALPHABET, SHORT_LINK_CHECKSUM_LENGTH,
+                            SHORT_LINK_MIN_ID_LENGTH)
+
+BASE = len(SHORT_LINK_ALPHABET)
+DIGITS = {char: value for value, char in enumerate(SHORT_LINK_ALPHABET)}
+
+
+def to_base62(number, length):
+    """Записывает число в base62, дополняя слева до длины length."""
+    chars = []
+    while number:
+        number, remainder = divmod(number, BASE)
+        chars.append(SHORT_LINK_ALPHABET[remainder])
+    return ''.join(reversed(chars)).rjust(length, SHORT_LINK_ALPHABET[0])
+
+
+def get_checksum(encoded_id):
+    """Контрольные символы для закодированного id рецепта."""
+    digest = hashlib.sha256(encoded_id.encode()).digest()
+    return to_base62(
+        int.from_bytes(digest[:4], 'big') % BASE ** SHORT_LINK_CHECKSUM_LENGTH,
+        SHORT_LINK_CHECKSUM_LENGTH
+    )
+
+
+def encode_short_link(recipe_id):
+    """
+    Возвращает код короткой ссылки рецепта: id в base62
+    и контрольные символы. Код однозначно определяется id,
+    поэтому коллизий нет, а декодирование не требует БД.
+    """
+    encoded_id = to_base62(recipe_id, SHORT_LINK_MIN_ID_LENGTH)
+    return encoded_id + get_checksum(encoded_id)
+
+
+def decode_short_link(short_link):
+    """
+    Возвращает id рецепта по коду короткой ссылки
+    или None, если код некорректен.
+    """
+    encoded_id = short_link[:-SHORT_LINK_CHECKSUM_LENGTH]
+    if (
+        len(encoded_id) < SHORT_LINK_MIN_ID_LENGTH
+        or any(char not in DIGITS for char in short_link)
+        or get_checksum(encoded_id) != short_link[len(encoded_id):]
+    ):
+        return None
+    recipe_id = 0
+    for char in encoded_id:
+        recipe_id = recipe_id * BASE + DIGITS[char]
+    return recipe_id
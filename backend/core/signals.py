@@ -0,0 +1,119 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.cart import refresh_cart_for_recipes, refresh_recipe_carts
+from core.catalog import ingredient_catalog, tag_catalog
+from core.counters import COUNTERS, change_counter
+from core.relations import RELATIONS, invalidate_relations
+from core.response_cache import recipe_response_cache
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingList, Tag)
+from users.models import User
+
+# Поля автора, которые отдаются вместе с рецептом.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name', 'avatar'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_catalog(sender, **kwargs):
+    """Меняет версию справочника тегов при изменении тега."""
+    tag_catalog.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_catalog(sender, **kwargs):
+    """Меняет версию справочника ингредиентов при изменении ингредиента."""
+    ingredient_catalog.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipe_responses(sender, **kwargs):
+    """Сбрасывает кэш ответов с рецептами при изменении рецептов."""
+    recipe_response_cache.invalidate()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipe_responses(sender, update_fields=None, **kwargs):
+    """
+    Сбрасывает кэш ответов с рецептами при изменении данных автора.
+    Обновление только служебных полей (например, last_login) кэш не трогает.
+    """
+    if update_fields is None or AUTHOR_FIELDS & set(update_fields):
+        recipe_response_cache.invalidate()
+
+
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+def refresh_cart_on_shopping_list_change(sender, instance, **kwargs):
+    """Обновляет суммы ингредиентов в списке покупок пользователя."""
+    if kwargs.get('created', True):
+        refresh_cart_for_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_cart_on_recipe_ingredient_change(sender, instance, **kwargs):
+    """
+    Обновляет суммы ингредиента в списках покупок с этим рецептом
+    при изменении строки через админку или ORM. Сериализатор рецептов
+    пересчитывает списки сам, без сигналов.
+    """
+    refresh_recipe_carts(instance.recipe_id, [instance.ingredient_id])
+
+
+def make_counter_receivers(owner_field, owner_model, counter):
+    """Создает обработчики сигналов для денормализованного счетчика."""
+    def increment(sender, instance, created, **kwargs):
+        if created:
+            change_counter(
+                owner_model, [getattr(instance, owner_field)], counter, 1
+            )
+
+    def decrement(sender, instance, **kwargs):
+        change_counter(
+            owner_model, [getattr(instance, owner_field)], counter, -1
+        )
+    return increment, decrement
+
+
+for model, owner_field, owner_model, counter in COUNTERS:
+    increment, decrement = make_counter_receivers(
+        owner_field, owner_model, counter
+    )
+    post_save.connect(
+        increment, sender=model, weak=False,
+        dispatch_uid=f'{counter}_increment',
+    )
+    post_delete.connect(
+        decrement, sender=model, weak=False,
+        dispatch_uid=f'{counter}_decrement',
+    )
+
+
+def make_relations_receiver(kind):
+    """Создает обработчик сигналов для сброса связей пользователя."""
+    def invalidate(sender, instance, **kwargs):
+        invalidate_relations(instance.user_id, kind)
+    return invalidate
+
+
+for kind, model, _ in RELATIONS:
+    invalidate = make_relations_receiver(kind)
+    post_save.connect(
+        invalidate, sender=model, weak=False,
+        dispatch_uid=f'{kind}_relations_save',
+    )
+    post_delete.connect(
+        invalidate, sender=model, weak=False,
+        dispatch_uid=f'{kind}_relations_delete',
+    )
@@ -0,0 +1,26 @@
+import logging
+
+from django.db import DatabaseError, connections
+
+from core import pdf
+from core.catalog import ingredient_catalog, tag_catalog
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """
+    Заранее загружает шрифты и фон pdf и справочники тегов
+    и ингредиентов. Вызывается в главном процессе gunicorn
+    до форка воркеров, которые получают готовые данные.
+    Соединения с БД закрываются, чтобы воркеры
+    не унаследовали общий сокет.
+    """
+    pdf.warm_up()
+    try:
+        for catalog in (tag_catalog, ingredient_catalog):
+            catalog.load()
+    except DatabaseError:
+        logger.warning('Справочники не загружены при старте.', exc_info=True)
+    finally:
+        connections.close_all()
@@ -1,36 +1,48 @@
-import io
-import os
+import csv
+import json
 
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
 from django.shortcuts import redirect
-from django.conf import settings
-from django.http import HttpResponse, HttpResponseNotFound
+from django.http import (HttpResponse, HttpResponseNotFound,
+                         StreamingHttpResponse)
 
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.async_db import database_sync_to_async
+from core.pdf import get_shopping_list_pdf
+from core.relations import (bulk_add_relations, bulk_remove_relations,
+                            get_counter)
+from core.serializers import BulkIdsSerializer
+from core.shortlinks import decode_short_link
 from recipes.models import ShortLinkRecipe
 
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch, cm
-from reportlab.lib.utils import ImageReader
+
+def get_legacy_recipe_id(short_link):
+    """id рецепта по ссылке, выданной до смены формата, или None."""
+    return ShortLinkRecipe.objects.filter(
+        Q(short_link=short_link) | Q(legacy_short_link=short_link)
+    ).values_list('recipe_id', flat=True).first()
 
 
-def redirect_original_url(request, short_link):
+async def redirect_original_url(request, short_link):
     """
-    Функция для получения рецепта из короткой ссылки.
+    Асинхронная функция для получения рецепта из короткой ссылки.
+    id рецепта декодируется из ссылки без обращения к БД,
+    в БД ищутся только ссылки, выданные до смены формата.
     Параметры функции:
     1) short_link - набор зашифрованных символов,
        который приходит из запроса <str:short_link>.
     """
-    try:
-        url = ShortLinkRecipe.objects.get(short_link=short_link)
-        original_link = url.original_link
-        list_link = original_link.split('/')
-        list_link.pop(-4)
-        recipe_link = "/".join(list_link)
-        return redirect(recipe_link)
-    except ShortLinkRecipe.DoesNotExist:
+    recipe_id = decode_short_link(short_link)
+    if recipe_id is None:
+        recipe_id = await database_sync_to_async(get_legacy_recipe_id)(
+            short_link
+        )
+    if recipe_id is None:
         return HttpResponseNotFound("Короткая ссылка не найдена!")
+    return redirect(f'/recipes/{recipe_id}/')
 
 
 def create_shop_cart(shopping_list):
@@ -42,45 +54,123 @@ def create_shop_cart(shopping_list):
     1) shopping_list - сформированный и отфильтрованный список
        ингредиентов с их количеством.
     """
-    gabriola_path = os.path.join(
-        settings.BASE_DIR, 'api', 'templates', 'gabriola.ttf'
-    )
-    georgia_path = os.path.join(
-        settings.BASE_DIR, 'api', 'templates', 'georgia.ttf'
+    return HttpResponse(
+        get_shopping_list_pdf(shopping_list), content_type='application/pdf'
     )
 
-    # Регистрируем шрифт для отображения киррилицы.
-    pdfmetrics.registerFont(
-        TTFont('Gabriola', gabriola_path)
-    )
-    pdfmetrics.registerFont(TTFont(
-        'Georgia', georgia_path)
-    )
-    # Открываем файл с фоном.
-    packet = io.BytesIO()
-    can = canvas.Canvas(packet, pagesize=letter)
-    # Путь до картинки.
-    img_path = os.path.join(
-        settings.BASE_DIR, 'api', 'templates', 'Shopp_list.jpg'
+
+class Echo:
+    """Псевдо-файл, который возвращает записанную строку для csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_txt(ingredients):
+    """Построчно формирует список покупок в виде текста."""
+    for ingredient in ingredients:
+        yield '{}   {}  ({})\n'.format(
+            ingredient['name'],
+            ingredient['ingredient_sum'],
+            ingredient['measurement_unit'],
+        )
+
+
+def stream_csv(ingredients):
+    """Построчно формирует список покупок в формате csv."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['name'],
+            ingredient['measurement_unit'],
+            ingredient['ingredient_sum'],
+        ))
+
+
+def stream_json(ingredients):
+    """Построчно формирует список покупок в формате json."""
+    separator = '['
+    for ingredient in ingredients:
+        yield separator + json.dumps({
+            'name': ingredient['name'],
+            'measurement_unit': ingredient['measurement_unit'],
+            'amount': ingredient['ingredient_sum'],
+        }, ensure_ascii=False)
+        separator = ',\n'
+    yield '[]' if separator == '[' else ']'
+
+
+STREAM_FORMATS = {
+    'txt': (stream_txt, 'text/plain; charset=utf-8'),
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'json': (stream_json, 'application/json'),
+}
+
+
+def stream_shop_cart(ingredients, file_format):
+    """
+    Вспомогательная функция для потоковой выгрузки списка покупок
+    в текстовых форматах без формирования файла в памяти.
+    Строки читаются из БД здесь, в потоке представления:
+    ASGI-обработчик Django 3.2 перебирает потоковый ответ
+    в цикле событий, где запросы к БД запрещены.
+    Вызывается в методe get_shopping_cart RecipeViewSet.
+    Параметры функции:
+    1) ingredients - queryset ингредиентов с их суммарным количеством;
+    2) file_format - один из ключей STREAM_FORMATS.
+    """
+    stream, content_type = STREAM_FORMATS[file_format]
+    return StreamingHttpResponse(
+        stream(list(ingredients)), content_type=content_type
     )
-    # Делаю фон.
-    background = ImageReader(img_path)
-    can.drawImage(background, 0, 0, width=letter[0], height=letter[1])
-    title = 'Cписок покупок: '
-    # Шрифт.
-    can.setFont('Georgia', 18)
-    y_title = (letter[1] - 0.5 * inch) - 4.3 * cm
-    x_title = (letter[0] - can.stringWidth(
-        " ".join(title), 'Georgia', 22)) - 4.2 * cm
-    can.drawString(x_title, y_title, title)
-    can.setFont('Gabriola', 16)
-    y_ingredient = (letter[1] - 0.5 * inch) - 4.8 * cm
-    # Отображаем список покупок.
-    for item in shopping_list:
-        x_ingredient = (letter[0] - can.stringWidth(
-            f' {item} ', 'Gabriola', 18)) - 8.5 * cm
-        can.drawString(x_ingredient, y_ingredient, item)
-        y_ingredient -= 0.2 * inch
-    can.save()
-    packet.seek(0)
-    return HttpResponse(packet.read(), content_type='application/pdf')
+
+
+def bulk_change_relations(request, model, targets):
+    """
+    Вспомогательная функция для массового добавления (POST)
+    и удаления (DELETE) связей пользователя: избранного,
+    списка покупок или подписок.
+    Все id проверяются одним запросом, изменения записываются
+    одним запросом в той же транзакции. Результат определяется
+    по строкам, которые запрос действительно изменил, поэтому
+    параллельные запросы не учитываются дважды.
+    Для каждого id возвращается результат:
+    created, deleted, exists (связь уже была), missing (связи не было)
+    или not_found (объекта нет или он недоступен).
+    Параметры функции:
+    1) request - объект запроса с полем 'ids' в теле;
+    2) model - модель Favorites, ShoppingList или Subscription;
+    3) targets - queryset объектов, с которыми можно создать связь.
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    pks = list(dict.fromkeys(serializer.validated_data['ids']))
+    field = get_counter(model)[0]
+    adding = request.method == 'POST'
+    with transaction.atomic():
+        linked = dict(targets.filter(pk__in=pks).annotate(
+            linked=Exists(model.objects.filter(
+                user=request.user, **{field: OuterRef('pk')}
+            ))
+        ).values_list('pk', 'linked'))
+        candidates = [
+            pk for pk in pks if pk in linked and linked[pk] != adding
+        ]
+        if adding:
+            changed = bulk_add_relations(model, request.user.id, candidates)
+        else:
+            changed = bulk_remove_relations(
+                model, request.user.id, candidates
+            )
+    changed = set(changed)
+    results = []
+    for pk in pks:
+        if pk not in linked:
+            result = 'not_found'
+        elif pk in changed:
+            result = 'created' if adding else 'deleted'
+        else:
+            result = 'exists' if adding else 'missing'
+        results.append({'id': pk, 'result': result})
+    return Response({'results': results}, status=status.HTTP_200_OK)
@@ -54,7 +54,7 @@ class ApiRecipeAdmin(admin.ModelAdmin):
     list_display_links = ('name',)
 
     def favorites_amount(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 class ApiFavoriteAdmin(admin.ModelAdmin):
@@ -88,6 +88,7 @@ class ApiShortLinkRecipeAdmin(admin.ModelAdmin):
         'id',
         'recipe',
         'short_link',
+        'legacy_short_link',
         'original_link',
     )
     search_fields = (
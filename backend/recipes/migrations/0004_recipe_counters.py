@@ -0,0 +1,34 @@
+# Generated by Django 3.2.16 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+from core.counters import rebuild_recipe_counters
+
+
+def fill_counters(apps, schema_editor):
+    rebuild_recipe_counters(
+        apps.get_model('recipes', 'Recipe'),
+        apps.get_model('recipes', 'Favorites'),
+        apps.get_model('recipes', 'ShoppingList'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в список покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 3.2.16 on 2026-10-18 02:39
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from core.constants import RECIPE_SEARCH_CONFIG
+
+POSTGRESQL_CREATE = [
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+    'ON recipes_recipe USING gin (search_vector)',
+    f"""
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector(
+                'pg_catalog.{RECIPE_SEARCH_CONFIG}', coalesce(NEW.name, '')
+            ), 'A')
+            || setweight(to_tsvector(
+                'pg_catalog.{RECIPE_SEARCH_CONFIG}', coalesce(NEW.text, '')
+            ), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    'CREATE TRIGGER recipes_recipe_search_vector_trigger '
+    'BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe '
+    'FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector_update()',
+    'UPDATE recipes_recipe SET name = name',
+]
+POSTGRESQL_DROP = [
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+    'ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()',
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+]
+SQLITE_CREATE = [
+    'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+    "name, text, content='recipes_recipe', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER recipes_recipe_fts_insert AFTER INSERT ON recipes_recipe '
+    'BEGIN INSERT INTO recipes_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER recipes_recipe_fts_delete AFTER DELETE ON recipes_recipe '
+    'BEGIN INSERT INTO recipes_recipe_fts'
+    '(recipes_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    'CREATE TRIGGER recipes_recipe_fts_update AFTER UPDATE ON recipes_recipe '
+    'BEGIN INSERT INTO recipes_recipe_fts'
+    '(recipes_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+]
+
+
+def execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Поисковый индекс рецептов по названию и описанию.
+    В PostgreSQL поле search_vector заполняется триггером
+    (название с весом A, описание с весом B) и индексируется GIN.
+    В SQLite вместо него используется таблица FTS5,
+    которая поддерживается в актуальном состоянии триггерами.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        execute(schema_editor, POSTGRESQL_CREATE)
+    elif vendor == 'sqlite':
+        execute(schema_editor, SQLITE_CREATE)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        execute(schema_editor, POSTGRESQL_DROP)
+    elif vendor == 'sqlite':
+        execute(schema_editor, SQLITE_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
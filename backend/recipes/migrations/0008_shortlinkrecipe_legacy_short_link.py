@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 02:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipeingredient_ingredient_recipe_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shortlinkrecipe',
+            name='legacy_short_link',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='Прежняя короткая ссылка'),
+        ),
+    ]
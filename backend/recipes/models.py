@@ -1,10 +1,15 @@
-from django.db import models
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
 from django.core.validators import MinValueValidator
 
 from users.models import User
+from core.models import CounterFieldsMixin
 from core.constants import (TAG_LENGTH, INGREDIENT_NAME_MAX_LENGTH,
                             MEASUREMENT_UNIT_MAX_LENGTH,
-                            RECIPE_NAME_MAX_LENGTH)
+                            RECIPE_NAME_MAX_LENGTH, RECIPE_SEARCH_CONFIG)
 
 
 class Tag(models.Model):
@@ -48,7 +53,117 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+def get_fts5_query(query):
+    """
+    Преобразует строку поиска в запрос FTS5: каждое слово берется
+    в кавычки и ищется по префиксу, слова объединяются через AND.
+    """
+    words = query.replace('"', ' ').split()
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов рецептов."""
+
+    def with_related(self):
+        """
+        Подгружает автора, теги и ингредиенты рецептов
+        фиксированным числом запросов.
+        """
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def search(self, query):
+        """
+        Полнотекстовый поиск по названию и описанию рецептов.
+        Рецепты сортируются по релевантности (аннотация search_rank).
+        В PostgreSQL используется поле search_vector с GIN-индексом,
+        в SQLite - таблица FTS5 recipes_recipe_fts.
+        """
+        vendor = connections[self.db].vendor
+        if vendor == 'postgresql':
+            search_query = SearchQuery(
+                query, config=RECIPE_SEARCH_CONFIG, search_type='websearch'
+            )
+            queryset = self.filter(search_vector=search_query).annotate(
+                search_rank=SearchRank(
+                    models.F('search_vector'), search_query
+                )
+            )
+        elif vendor == 'sqlite':
+            fts5_query = get_fts5_query(query)
+            if not fts5_query:
+                return self.none()
+            queryset = self.filter(pk__in=RawSQL(
+                'SELECT rowid FROM recipes_recipe_fts '
+                'WHERE recipes_recipe_fts MATCH %s',
+                (fts5_query, )
+            )).annotate(search_rank=RawSQL(
+                'SELECT -rank FROM recipes_recipe_fts '
+                'WHERE recipes_recipe_fts MATCH %s '
+                'AND rowid = recipes_recipe.id',
+                (fts5_query, ),
+                output_field=models.FloatField()
+            ))
+        else:
+            return self.filter(
+                models.Q(name__icontains=query)
+                | models.Q(text__icontains=query)
+            )
+        return queryset.order_by('-search_rank', '-pub_date', '-id')
+
+    def with_coverage(self, ingredient_ids, min_coverage):
+        """
+        Оставляет рецепты, которые можно приготовить из ингредиентов
+        ingredient_ids хотя бы на долю min_coverage, и сортирует их
+        по этой доле (аннотации matched_ingredients и coverage).
+        Считается одним агрегирующим запросом по RecipeIngredient
+        только для рецептов, содержащих хотя бы один из ингредиентов.
+        Параметры метода:
+        1) ingredient_ids - id имеющихся ингредиентов;
+        2) min_coverage - минимальная доля ингредиентов рецепта от 0 до 1.
+        """
+        return self.filter(
+            pk__in=RecipeIngredient.objects.filter(
+                ingredient_id__in=ingredient_ids
+            ).values('recipe_id')
+        ).annotate(
+            matched_ingredients=models.Count(
+                'recipeingredients',
+                filter=models.Q(
+                    recipeingredients__ingredient_id__in=ingredient_ids
+                )
+            ),
+            total_ingredients=models.Count('recipeingredients'),
+        ).annotate(
+            coverage=models.ExpressionWrapper(
+                Cast('matched_ingredients', models.FloatField())
+                / models.F('total_ingredients'),
+                output_field=models.FloatField()
+            )
+        ).filter(
+            coverage__gte=min_coverage
+        ).order_by('-coverage', '-matched_ingredients', '-pub_date', '-id')
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    """
+    Менеджер рецептов. Поле search_vector нужно только условиям
+    поиска в SQL, поэтому в выборках рецептов оно не загружается.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель Recipe."""
     author = models.ForeignKey(
         User,
@@ -78,6 +193,11 @@ class Recipe(models.Model):
         verbose_name='Картинка',
         upload_to='recipes'
     )
+    thumbnail = models.ImageField(
+        verbose_name='Миниатюра',
+        upload_to='recipes/thumbnails',
+        blank=True,
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления в минутах',
         validators=[MinValueValidator(1)]
@@ -87,11 +207,40 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в список покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    counter_fields = ('favorites_count', 'shopping_cart_count')
+
+    objects = RecipeManager()
 
     class Meta:
         ordering = ('-pub_date', )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -116,6 +265,12 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиенты рецепта'
         verbose_name_plural = 'Ингредиенты рецептов'
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='recipeingredient_ingr_rec_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.recipe} - {self.ingredient}'
@@ -132,6 +287,13 @@ class ShortLinkRecipe(models.Model):
         unique=True,
         verbose_name='Короткая ссылка',
     )
+    legacy_short_link = models.CharField(
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Прежняя короткая ссылка',
+    )
 
     class Meta:
         verbose_name = 'Короткая ссылка'
@@ -159,6 +321,12 @@ class Favorites(models.Model):
                 name='unique_user_recipe_favorites'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorites_recipe_user_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в избранное.'
@@ -182,6 +350,43 @@ class ShoppingList(models.Model):
                 name='unique_user_recipe_shoppinglist'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='shoppinglist_recipe_user_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в список покупок.'
+
+
+class ShoppingCartItem(models.Model):
+    """
+    Модель суммарного количества ингредиента в списке покупок
+    пользователя. Поддерживается в актуальном состоянии
+    при изменении списка покупок и ингредиентов рецептов
+    (см. core.cart).
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='cart_items',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name='cart_items',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient_cart_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
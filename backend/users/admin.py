@@ -10,6 +10,8 @@ class ApiUserAdmin(admin.ModelAdmin):
         'username',
         'first_name',
         'last_name',
+        'recipes_count',
+        'followers_count',
     )
     search_fields = ('username', 'email', )
     list_filter = (
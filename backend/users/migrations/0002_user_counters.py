@@ -0,0 +1,35 @@
+# Generated by Django 3.2.16 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+from core.counters import rebuild_user_counters
+
+
+def fill_counters(apps, schema_editor):
+    rebuild_user_counters(
+        apps.get_model('users', 'User'),
+        apps.get_model('recipes', 'Recipe'),
+        apps.get_model('users', 'Subscription'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
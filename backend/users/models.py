@@ -3,9 +3,10 @@ from django.core.validators import RegexValidator
 from django.contrib.auth.models import AbstractUser
 
 from core.constants import USER_LENGTH, EMAIL_MAX_LENGTH, REGEX_VALID
+from core.models import CounterFieldsMixin
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     """Кастомная модель пользователя."""
 
     USERNAME_FIELD = 'email'
@@ -46,6 +47,18 @@ class User(AbstractUser):
         default=None,
         upload_to='users',
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         verbose_name = 'Пользователь'
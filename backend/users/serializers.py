@@ -3,6 +3,7 @@ from rest_framework.validators import UniqueTogetherValidator
 
 from djoser import serializers as djoser_serializer
 
+from core.relations import get_relation_ids
 from core.serializers import Base64ImageField, ShortRecipeSerializer
 from users.models import User, Subscription
 
@@ -39,12 +40,11 @@ class UserSerializer(djoser_serializer.UserSerializer):
         Метод для вычисления поля сериализатора is_subscribed.
         Возращает True, если пользователь подписан на автора.
         """
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return Subscription.objects.filter(
-            user=request.user, author=obj
-        ).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in get_relation_ids(
+            self.context.get('request'), 'subscriptions'
+        )
 
 
 class SubscriptionListSerializer(serializers.ModelSerializer):
@@ -72,11 +72,11 @@ class SubscriptionListSerializer(serializers.ModelSerializer):
         Метод для вычисления поля сериализатора is_subscribed.
         Возращает True, если пользователь подписан на автора.
         """
-        request = self.context.get('request')
-        if request is not None or request.user.is_authenticated:
-            return Subscription.objects.filter(
-                user=request.user, author=obj).exists()
-        return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in get_relation_ids(
+            self.context.get('request'), 'subscriptions'
+        )
 
     def get_recipes(self, obj):
         """
@@ -86,18 +86,21 @@ class SubscriptionListSerializer(serializers.ModelSerializer):
         по параметру 'recipes_limit'.
         """
         request = self.context.get('request')
-        recipes_limit = None
-        if request:
-            recipes_limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if recipes_limit:
-            recipes = obj.recipes.all()[:int(recipes_limit)]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes_limit = None
+            if request:
+                recipes_limit = request.query_params.get('recipes_limit')
+            recipes = obj.recipes.all()
+            if recipes_limit:
+                recipes = obj.recipes.all()[:int(recipes_limit)]
         return ShortRecipeSerializer(recipes, many=True,
                                      context={'request': request}).data
 
     def get_recipes_count(self, obj):
         """Метод возвращающий количество рецптов."""
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -1,4 +1,7 @@
 from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import (BooleanField, OuterRef, Prefetch, Subquery,
+                              Value)
 from django.shortcuts import get_object_or_404
 
 from djoser import views as djoser_viewset
@@ -9,12 +12,39 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from api.pagination import CustomPagination
+from core.images import schedule_avatar
+from core.serializers import ShortRecipeSerializer
+from core.views import bulk_change_relations
+from recipes.models import Recipe
 from users.models import User, Subscription
 from users.serializers import (AvatarSerializer, UserSerializer,
                                SubscriptionListSerializer,
                                SubscriptionSerializer)
 
 
+def get_recipes_prefetch(recipes_limit):
+    """
+    Вспомогательная функция для выборки рецептов авторов из подписок.
+    Возвращает Prefetch, который одним запросом загружает
+    не более recipes_limit последних рецептов каждого автора
+    в атрибут limited_recipes.
+    Параметры функции:
+    1) recipes_limit - значение параметра запроса 'recipes_limit'.
+    """
+    recipes = Recipe.objects.only(
+        'author', *ShortRecipeSerializer.Meta.fields
+    )
+    if recipes_limit and recipes_limit.isdigit():
+        recipes = recipes.filter(
+            pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:int(recipes_limit)]
+            )
+        )
+    return Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+
+
 class UserViewSet(djoser_viewset.UserViewSet):
     """""Вьюсет из djoser."""
     queryset = User.objects.all()
@@ -41,8 +71,9 @@ class UserViewSet(djoser_viewset.UserViewSet):
             avatar = serializer.validated_data.get('avatar')
             request.user.avatar = avatar
             request.user.save()
+            schedule_avatar(request.user)
             avatar_url = self.request.build_absolute_uri(
-                f'/media/users/{avatar.name}'
+                request.user.avatar.url
             )
             return Response({'avatar': avatar_url}, status=status.HTTP_200_OK)
         file_path = request.user.avatar.path
@@ -57,25 +88,25 @@ class UserViewSet(djoser_viewset.UserViewSet):
         permission_classes=[IsAuthenticated],
     )
     def get_subscriptions(self, request):
-        user = get_object_or_404(User, pk=request.user.id)
-        user_sub = user.follower.all()
-        following = [sub.author for sub in user_sub]
-        pagination = CustomPagination()
-        numbering = pagination.paginate_queryset(following, request)
-        if user_sub is not None:
-            serializer = SubscriptionListSerializer(
-                numbering, many=True, context={'request': request}
-            )
-            return pagination.get_paginated_response(serializer.data)
+        following = User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            get_recipes_prefetch(request.query_params.get('recipes_limit'))
+        ).order_by('following__id')
+        page = self.paginate_queryset(following)
         serializer = SubscriptionListSerializer(
-            following, context={'request': request})
-        return Response(serializer.data)
+            page, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
 
     @action(
         ['post', 'delete', ], detail=True,
         url_path='subscribe',
         permission_classes=[IsAuthenticated],
     )
+    @transaction.atomic
     def subscribe_or_unsubscribe(self, request, id):
         author = get_object_or_404(User, pk=id)
         user = request.user
@@ -97,3 +128,16 @@ class UserViewSet(djoser_viewset.UserViewSet):
             )
         subscrip.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        ['post', 'delete', ], detail=False, url_path='bulk_subscribe',
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_subscribe(self, request):
+        """
+        Метод, который подписывает на авторов из списка 'ids'
+        либо отписывает от них.
+        """
+        return bulk_change_relations(
+            request, Subscription, User.objects.exclude(pk=request.user.pk)
+        )